@@ -3,11 +3,17 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 from database import get_db
-from database import SessionLocal
 from models import User
-import re
+from cache import TTLCache, MISSING
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hmac
+import os
+import time
 
 # ================= CONFIG =================
 
@@ -15,7 +21,31 @@ SECRET_KEY = "SECRET123"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor; hashes made with any other cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# threads reserved for hashing, separate from the request threadpool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+# users allowed on operational and cross-user endpoints, e.g. "1,42"; none by default
+ADMIN_USER_IDS = frozenset(
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()
+)
+# bearer token a Prometheus scraper sends to the metrics endpoints instead
+# of an admin login; unset, only admins can read them
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so these threads hash in parallel
+hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
 
 # 🔑 MUST MATCH LOGIN ROUTE EXACTLY
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
@@ -31,7 +61,21 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
-    
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, hash_password, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the stored hash was made
+    with a different work factor and should be replaced."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        hash_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
 
 def create_access_token(user_id: int):
     payload = {
@@ -40,34 +84,127 @@ def create_access_token(user_id: int):
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
+# ================= AUTH CACHE =================
+
+# token -> (user_id, exp); a pure function of the signed token, so it only
+# needs to expire, never to be invalidated
+token_cache = TTLCache("auth_tokens", maxsize=100000, ttl=300)
+
+# user_id -> (email, name); dropped when a User row changes
+identity_cache = TTLCache("auth_identities", maxsize=100000, ttl=300)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_user_ids", None)
+
+
+class CurrentUser:
+    """Authenticated identity served from the auth cache.
+
+    `id`, `email` and `name` need no query; handlers that need the full row
+    call `await current_user.load()`.
+    """
+
+    def __init__(self, id: int, email: str, name: str, db: AsyncSession):
+        self.id = id
+        self.email = email
+        self.name = name
+        self._db = db
+        self._user = None
+
+    async def load(self) -> User:
+        if self._user is None:
+            self._user = await self._db.get(User, self.id)
+        return self._user
+
+
 # ================= CURRENT USER =================
 
-def get_current_user(
+def _decode_token(token: str, credentials_exception):
+    claims = token_cache.get(token)
+    if claims is MISSING:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = int(payload["sub"])
+            exp = payload.get("exp")
+        except (JWTError, KeyError, TypeError, ValueError):
+            raise credentials_exception
+
+        claims = (user_id, exp)
+        ttl = None if exp is None else exp - time.time()
+        token_cache.set(token, claims, ttl=ttl)
+
+    user_id, exp = claims
+    if exp is not None and exp < time.time():
+        token_cache.invalidate(token)
+        raise credentials_exception
+
+    return user_id
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="User not found",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
+    user_id = _decode_token(token, credentials_exception)
 
-        print("JWT user ID:",user_id)
+    identity = identity_cache.get(user_id)
+    if identity is MISSING:
+        generation = identity_cache.generation(user_id)
 
-        if user_id is None:
+        # ✅ QUERY BY ID (NOT EMAIL)
+        result = await db.execute(
+            select(User.email, User.name).where(User.id == user_id)
+        )
+        row = result.first()
+        if row is None:
             raise credentials_exception
 
-    except JWTError:
-        raise credentials_exception
+        identity = (row.email, row.name)
+        identity_cache.set(user_id, identity, generation)
 
-    # ✅ QUERY BY ID (NOT EMAIL)
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    email, name = identity
+    return CurrentUser(user_id, email, name, db)
 
-    if user is None:
-        raise credentials_exception
 
-    return user
\ No newline at end of file
+async def get_admin_user(
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
+    if current_user.id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
+async def get_metrics_reader(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    """Operational stats (pools, caches, per-route traffic): the scrape
+    token or an admin."""
+    if METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return None
+    return await get_admin_user(await get_current_user(token, db))
@@ -0,0 +1,286 @@
+"""Auto-pay for bills with auto_pay=True.
+
+Due bills are claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED, so
+any number of workers (threads, processes or app instances) can drain the
+queue in parallel without paying a bill twice. For each bill the user's
+first account (by id) that can cover it is debited, a Transaction is
+recorded and the bill is marked paid -- all in the batch's DB transaction.
+Bills no account can cover are left due and retried on the next run.
+
+    python autopay.py run [--dry-run] [--batch-size 500] [--workers 4]
+    python autopay.py serve --interval 300
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select, insert, func, tuple_
+
+from database import SessionLocal, engine
+from models import Account, Bill, Transaction
+from rollup import RollupDeltas, apply_rollup
+from balances import BalanceDeltas, apply_balances
+from cache import touch_user
+from categorizer import SOURCE_SYSTEM
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+PAID = "paid"
+# seconds between scheduled runs inside the app; 0 leaves scheduling to cron / `serve`
+AUTOPAY_INTERVAL = float(os.getenv("AUTOPAY_INTERVAL", "0"))
+
+
+@dataclass
+class AutoPayResult:
+    paid: int = 0
+    skipped: int = 0            # no account could cover the bill
+    amount: float = 0.0
+    batches: int = 0
+    seconds: float = 0.0
+    dry_run: bool = False
+    # (due_date, id) of the last bill claimed; the next batch starts after it
+    last_key: tuple = None
+    details: list = field(default_factory=list)
+
+    def merge(self, other: "AutoPayResult"):
+        self.paid += other.paid
+        self.skipped += other.skipped
+        self.amount += other.amount
+        self.batches += other.batches
+        self.details.extend(other.details)
+
+    @property
+    def bills_per_second(self) -> float:
+        return self.paid / self.seconds if self.seconds else 0.0
+
+
+def due_bills_query(today: date):
+    # matches the partial index ix_bills_autopay_due (auto_pay, by due_date)
+    return (
+        select(Bill)
+        .where(
+            Bill.auto_pay == True,  # noqa: E712
+            Bill.due_date <= today,
+            func.coalesce(Bill.status, "") != PAID,
+        )
+        .order_by(Bill.due_date, Bill.id)
+    )
+
+
+# ================= ONE BATCH =================
+
+def process_batch(db, today: date, batch_size: int = BATCH_SIZE, dry_run: bool = False,
+                  after: tuple = None, balances: dict = None) -> AutoPayResult:
+    """Claim up to `batch_size` due bills past `after` and pay them (no commit).
+
+    `balances` carries projected balances between dry-run batches; real runs
+    always read them from the locked account rows."""
+    result = AutoPayResult(dry_run=dry_run)
+
+    query = due_bills_query(today).limit(batch_size)
+    if after is not None:
+        query = query.where(tuple_(Bill.due_date, Bill.id) > after)
+    if not dry_run:
+        query = query.with_for_update(skip_locked=True)
+
+    bills = db.scalars(query).all()
+    if not bills:
+        return result
+    result.batches = 1
+    result.last_key = (bills[-1].due_date, bills[-1].id)
+
+    # lock the payers' accounts in id order (consistent order, no deadlocks)
+    user_ids = {bill.user_id for bill in bills}
+    account_query = (
+        select(Account)
+        .where(Account.user_id.in_(user_ids))
+        .order_by(Account.id)
+    )
+    if not dry_run:
+        account_query = account_query.with_for_update()
+
+    accounts_by_user = {}
+    for account in db.scalars(account_query):
+        accounts_by_user.setdefault(account.user_id, []).append(account)
+
+    available = balances if balances is not None else {}
+    for accounts in accounts_by_user.values():
+        for account in accounts:
+            available.setdefault(account.id, Decimal(str(account.balance or 0)))
+
+    now = datetime.utcnow()
+    txn_rows = []
+    debits = BalanceDeltas()
+    deltas = RollupDeltas()
+
+    for bill in bills:
+        amount = Decimal(str(bill.amount_due))
+        payer = next(
+            (a for a in accounts_by_user.get(bill.user_id, []) if available[a.id] >= amount),
+            None
+        )
+        if payer is None:
+            result.skipped += 1
+            if dry_run:
+                result.details.append({"bill_id": bill.id, "account_id": None,
+                                       "amount": float(amount)})
+            continue
+
+        available[payer.id] -= amount
+        debits.add(bill.user_id, payer.id, -amount)
+        result.paid += 1
+        result.amount += float(amount)
+
+        if dry_run:
+            result.details.append({"bill_id": bill.id, "account_id": payer.id,
+                                   "amount": float(amount)})
+            continue
+
+        bill.status = PAID
+        txn_rows.append({
+            "account_id": payer.id,
+            "amount": amount,
+            "txn_type": "debit",
+            "category": "Bills",
+            "category_source": SOURCE_SYSTEM,
+            "merchant": bill.biller_name,
+            "description": f"Auto-pay bill #{bill.id}",
+            "txn_date": now,
+        })
+        deltas.add(bill.user_id, payer.id, now, "Bills", "debit", amount)
+
+    if dry_run or not txn_rows:
+        return result
+
+    # one UPDATE per account, however many of its bills were paid
+    apply_balances(db, debits, returning=False)
+
+    db.execute(insert(Transaction), txn_rows)
+    apply_rollup(db, deltas)
+    for user_id in user_ids:
+        touch_user(db, user_id)
+
+    return result
+
+
+# ================= DRAIN THE QUEUE =================
+
+def _drain(today, batch_size, dry_run) -> AutoPayResult:
+    total = AutoPayResult(dry_run=dry_run)
+    balances = {} if dry_run else None
+    db = SessionLocal()
+    try:
+        while True:
+            batch = process_batch(db, today, batch_size, dry_run,
+                                  after=total.last_key, balances=balances)
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            total.merge(batch)
+
+            # a short batch means the queue is drained, apart from bills locked
+            # by other workers or not covered -- those are picked up next run
+            if batch.batches == 0 or batch.paid + batch.skipped < batch_size:
+                return total
+            total.last_key = batch.last_key
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run(today: date = None, batch_size: int = BATCH_SIZE,
+        workers: int = 1, dry_run: bool = False) -> AutoPayResult:
+    today = today or date.today()
+    # SQLite has no row locks to share the queue with; dry runs page in order
+    if dry_run or engine.dialect.name == "sqlite":
+        workers = 1
+
+    results = [None] * workers
+    errors = []
+
+    def worker(i):
+        try:
+            results[i] = _drain(today, batch_size, dry_run)
+        except Exception as exc:
+            errors.append(exc)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    total = AutoPayResult(dry_run=dry_run)
+    for result in results:
+        total.merge(result)
+    total.seconds = time.perf_counter() - start
+    return total
+
+
+def serve(interval: float, batch_size: int = BATCH_SIZE, workers: int = 1,
+          stop: threading.Event = None):
+    """Run forever (or until `stop` is set), draining the queue every `interval` s."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            result = run(batch_size=batch_size, workers=workers)
+            if result.paid or result.skipped:
+                logger.info("auto-pay: %s", _summary(result))
+        except Exception:
+            # keep serving; the bills stay due and are retried next run
+            logger.exception("auto-pay run failed")
+        stop.wait(interval)
+
+
+def _summary(result: AutoPayResult) -> str:
+    verb = "would pay" if result.dry_run else "paid"
+    return (f"{verb} {result.paid} bills ({result.amount:.2f}), "
+            f"{result.skipped} not covered, {result.batches} batches in "
+            f"{result.seconds:.2f}s ({result.bills_per_second:.0f} bills/s)")
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bill auto-pay")
+    parser.add_argument("command", choices=["run", "serve"])
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would be paid, change nothing")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=300,
+                        help="seconds between runs (serve)")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="pay bills due on or before YYYY-MM-DD (default today)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "serve":
+        serve(args.interval, args.batch_size, args.workers)
+        return 0
+
+    result = run(args.date, args.batch_size, args.workers, args.dry_run)
+    if args.dry_run:
+        for item in result.details:
+            payer = item["account_id"] if item["account_id"] is not None else "-- not covered"
+            logger.info("bill %s: %.2f from account %s", item["bill_id"], item["amount"], payer)
+    logger.info(_summary(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
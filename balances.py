@@ -0,0 +1,83 @@
+"""Account balance writes.
+
+Writers collect signed amounts in a BalanceDeltas and call apply_balances()
+inside the same DB transaction as the rows they describe. Each account gets
+exactly one
+
+    UPDATE accounts SET balance = balance + :delta
+    WHERE id = :account_id AND user_id = :user_id RETURNING balance
+
+so the increment happens in the database (no SELECT, no lost updates between
+concurrent writers) and ownership is checked by the same statement.
+"""
+from sqlalchemy import update, bindparam
+
+from models import Account
+
+
+class BalanceDeltas:
+    def __init__(self):
+        self.items = {}
+
+    def add(self, user_id, account_id, amount):
+        key = (user_id, account_id)
+        self.items[key] = self.items.get(key, 0) + float(amount)
+
+    def merge(self, other: "BalanceDeltas"):
+        for key, amount in other.items.items():
+            self.items[key] = self.items.get(key, 0) + amount
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def balance_update(user_id, account_id, delta):
+    return (
+        update(Account)
+        .where(Account.id == account_id, Account.user_id == user_id)
+        .values(balance=Account.balance + delta)
+        .returning(Account.balance)
+        .execution_options(synchronize_session=False)
+    )
+
+
+_accounts = Account.__table__
+_batch_update = (
+    _accounts.update()
+    .where(_accounts.c.id == bindparam("b_account_id"),
+           _accounts.c.user_id == bindparam("b_user_id"))
+    .values(balance=_accounts.c.balance + bindparam("b_delta"))
+)
+
+
+def apply_balances(db, deltas: BalanceDeltas, returning: bool = True):
+    """Apply the deltas (no commit); returns {account_id: new balance}.
+
+    Accounts that do not exist or belong to another user are missing from
+    the result -- callers treat that as 404 and roll back. Batch writers
+    that do not need the new balances pass returning=False: the same UPDATE
+    then goes out as one executemany."""
+    # account id order, so concurrent multi-account writers cannot deadlock
+    items = sorted(deltas.items.items(), key=lambda kv: kv[0][1])
+
+    if not returning:
+        if items:
+            db.execute(_batch_update, [
+                {"b_account_id": account_id, "b_user_id": user_id, "b_delta": delta}
+                for (user_id, account_id), delta in items
+            ])
+        return None
+
+    balances = {}
+    for (user_id, account_id), delta in items:
+        new_balance = db.execute(balance_update(user_id, account_id, delta)).scalar()
+        if new_balance is not None:
+            balances[account_id] = new_balance
+    return balances
+
+
+def apply_balance(db, user_id, account_id, amount):
+    """Single-account shortcut; returns the new balance or None (not owned)."""
+    deltas = BalanceDeltas()
+    deltas.add(user_id, account_id, amount)
+    return apply_balances(db, deltas).get(account_id)
@@ -0,0 +1,175 @@
+"""GET /analytics/spending-series on users with years of daily transactions.
+
+    python benchmarks/bench_analytics.py --years 6 --per-day 8
+    DATABASE_URL=postgresql://... python benchmarks/bench_analytics.py
+
+For each granularity over the user's full history, reports the SQL
+aggregation time and the series statistics time: NumPy (build_series, as
+served) vs a plain-Python loop implementation of the same numbers, which
+is also used to check the NumPy output.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_analytics.db')}")
+
+import numpy as np
+from sqlalchemy import insert, select, func
+
+import rollup
+from database import Base, engine, SessionLocal
+from models import User, Account, Transaction
+from schemas import Granularity
+from routers.analytics import (
+    DEFAULT_WINDOW, PERCENTILES, build_series, period_bounds, series_query, _period_index
+)
+
+USER_ID = 1
+CATEGORIES = ["Food", "Shopping", "Travel", "Bills", "Fuel", "Health", "Entertainment",
+              "Groceries", "Rent", "Education", None]
+
+
+def seed(years, per_day):
+    rng = random.Random(25)
+    today = date.today()
+    days = years * 365
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "name": "bench", "email": "bench@example.com",
+                                     "password": "x", "phone": "9000000001"}])
+        conn.execute(insert(Account), [
+            {"id": a, "user_id": USER_ID, "bank_name": "Bench", "account_type": kind,
+             "balance": 0}
+            for a, kind in ((1, "savings"), (2, "current"), (3, "credit"))
+        ])
+    rows = []
+    for day in range(days):
+        stamp = datetime.combine(today - timedelta(days=day), datetime.min.time())
+        for _ in range(rng.randint(per_day // 2, per_day * 3 // 2)):
+            credit = rng.random() < 0.1
+            rows.append({
+                "account_id": rng.randint(1, 3),
+                "amount": round(rng.uniform(1000, 50000) if credit else rng.uniform(10, 3000), 2),
+                "txn_type": "credit" if credit else "debit",
+                "category": rng.choice(CATEGORIES),
+                "merchant": "bench",
+                "txn_date": stamp + timedelta(minutes=rng.randint(0, 24 * 60 - 1)),
+            })
+    with engine.begin() as conn:
+        for start in range(0, len(rows), 50000):
+            conn.execute(insert(Transaction), rows[start:start + 50000])
+
+    db = SessionLocal()
+    try:
+        rollup.rebuild(db, user_id=USER_ID)
+    finally:
+        db.close()
+
+
+def python_stats(rows, granularity, start, count, window):
+    """The same per-series numbers with dicts and loops (the baseline),
+    rounded for the response like build_series."""
+    index = _period_index(granularity, [r[0] for r in rows], start).tolist() if rows else []
+    series = {}
+    for i, (_, category, txn_type, amount) in zip(index, rows):
+        totals = series.setdefault((txn_type, category or ""), [0.0] * count)
+        totals[i] += float(amount)
+
+    out = {}
+    for key, totals in series.items():
+        rolling, running = [], 0.0
+        for i, value in enumerate(totals):
+            running += value
+            if i >= window:
+                running -= totals[i - window]
+            rolling.append(running / min(i + 1, window))
+        delta = [None] + [totals[i] - totals[i - 1] for i in range(1, count)]
+        ordered = sorted(totals)
+        pct = []
+        for p in PERCENTILES:
+            # linear interpolation, as numpy.percentile
+            pos = (count - 1) * p / 100
+            lo = int(pos)
+            hi = min(lo + 1, count - 1)
+            pct.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+        out[key] = {
+            "total": round(sum(totals), 2),
+            "mean": round(statistics.fmean(totals), 2),
+            "totals": [round(v, 2) for v in totals],
+            "rolling_avg": [round(v, 2) for v in rolling],
+            "delta": [None if v is None else round(v, 2) for v in delta],
+            "percentiles": [round(v, 2) for v in pct],
+        }
+    return out
+
+
+def check(result, baseline):
+    kinds = {"income": "credit", "expense": "debit"}
+    for s in result["series"]:
+        expected = baseline[(kinds[s["type"]], s["category"] or "")]
+        assert abs(s["total"] - expected["total"]) < 0.01
+        assert np.allclose(s["rolling_avg"], expected["rolling_avg"], atol=0.01)
+        assert np.allclose([p for p in s["percentiles"].values()], expected["percentiles"], atol=0.01)
+    assert len(result["series"]) == len(baseline)
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    return value, statistics.median(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--per-day", type=int, default=8, help="average transactions per day")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        first = conn.execute(select(func.min(Transaction.txn_date))).scalar()
+        existing = conn.execute(select(func.count(Transaction.id))).scalar()
+    if not first or (date.today() - first.date()).days < args.years * 365 - 1:
+        seed(args.years, args.per_day)
+        with engine.connect() as conn:
+            first = conn.execute(select(func.min(Transaction.txn_date))).scalar()
+            existing = conn.execute(select(func.count(Transaction.id))).scalar()
+
+    from_date, to_date = first.date(), date.today()
+    print(f"{engine.dialect.name}: {existing} transactions from {from_date} to {to_date}")
+    print(f"{'granularity':<12} {'periods':>7} {'series':>6} {'sql ms':>8} "
+          f"{'numpy ms':>9} {'python ms':>10} {'speedup':>8}")
+
+    for granularity in Granularity:
+        start, count = period_bounds(granularity, from_date, to_date)
+        window = DEFAULT_WINDOW[granularity]
+        query = series_query(USER_ID, granularity, start, to_date, engine.dialect.name)
+
+        with engine.connect() as conn:
+            rows, sql_ms = timed(lambda: conn.execute(query).all(), args.runs)
+
+        result, numpy_ms = timed(
+            lambda: build_series(rows, granularity, start, count, window), args.runs)
+        baseline, python_ms = timed(
+            lambda: python_stats(rows, granularity, start, count, window), args.runs)
+        check(result, baseline)
+
+        print(f"{granularity.value:<12} {count:>7} {len(result['series']):>6} {sql_ms:>8.1f} "
+              f"{numpy_ms:>9.2f} {python_ms:>10.2f} {python_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Sync (threadpool + psycopg2) vs async (event loop + asyncpg) request path,
+side by side, under the same concurrent I/O-bound load.
+
+    pip install httpx
+    python benchmarks/bench_async.py --url postgresql://user:pw@localhost/db \\
+        --concurrency 1000 --requests 5000 --db-latency-ms 20
+
+Both routes run the same query; --db-latency-ms adds pg_sleep() on Postgres
+so the database wait dominates, which is where the async path should pull
+ahead. With SQLite there is no server-side wait and numbers mostly reflect
+per-request overhead.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import DATABASE_URL, async_url
+
+
+def build_app(url, latency_s, pool_size):
+    sync_engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(async_url(url), pool_size=pool_size, max_overflow=0)
+
+    if sync_engine.dialect.name == "postgresql":
+        query = text("SELECT pg_sleep(:s), 1").bindparams(s=latency_s)
+    else:
+        query = text("SELECT 1")
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_route():
+        with sync_engine.connect() as conn:
+            return {"rows": len(conn.execute(query).all())}
+
+    @app.get("/async")
+    async def async_route():
+        async with async_engine.connect() as conn:
+            return {"rows": len((await conn.execute(query)).all())}
+
+    return app
+
+
+async def drive(base_url, path, requests, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - start) * 1e3)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    parser.add_argument("--pool-size", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    app = build_app(args.url, args.db_latency_ms / 1000, args.pool_size)
+    server = uvicorn.Server(uvicorn.Config(
+        app, port=args.port, log_level="warning", backlog=args.concurrency * 2
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"pool {args.pool_size}, db latency {args.db_latency_ms} ms")
+    print(f"{'path':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for path in ("/sync", "/async"):
+        result = asyncio.run(drive(base_url, path, args.requests, args.concurrency))
+        print(f"{path:<8} {result['rps']:>9.1f} {result['p50']:>9.1f} "
+              f"{result['p95']:>9.1f} {result['errors']:>7}")
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
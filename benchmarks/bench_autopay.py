@@ -0,0 +1,88 @@
+"""Auto-pay throughput: bills paid per second across batch sizes and workers.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_autopay.py --bills 20000 --workers 1,4,8
+    python benchmarks/bench_autopay.py            # local SQLite, single worker
+
+Every configuration starts from a freshly seeded queue of due auto-pay bills;
+after each run it checks that every bill was paid exactly once.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_autopay.db')}")
+
+from sqlalchemy import insert, select, func
+
+import autopay
+from database import Base, engine
+from models import User, Account, Bill, Transaction
+
+
+def seed(bills, users):
+    rng = random.Random(18)
+    today = date.today()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": u, "name": f"user{u}", "email": f"user{u}@example.com",
+             "password": "x", "phone": f"9{u:09d}"}
+            for u in range(1, users + 1)
+        ])
+        conn.execute(insert(Account), [
+            {"id": u, "user_id": u, "bank_name": "Bench", "account_type": "savings",
+             "balance": 10 ** 9}
+            for u in range(1, users + 1)
+        ])
+        conn.execute(insert(Bill), [
+            {"user_id": rng.randint(1, users), "biller_name": f"Biller {i}",
+             "due_date": today - timedelta(days=rng.randint(0, 90)),
+             "amount_due": round(rng.uniform(100, 3000), 2),
+             "status": "upcoming", "auto_pay": True}
+            for i in range(bills)
+        ])
+
+
+def check(bills):
+    with engine.connect() as conn:
+        unpaid = conn.execute(
+            select(func.count(Bill.id)).where(Bill.status != autopay.PAID)
+        ).scalar()
+        payments = conn.execute(
+            select(func.count(Transaction.id)).where(Transaction.category == "Bills")
+        ).scalar()
+    assert unpaid == 0, f"{unpaid} bills left unpaid"
+    assert payments == bills, f"{payments} payments for {bills} bills"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bills", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    parser.add_argument("--workers", default="1,4")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    if engine.dialect.name == "sqlite":
+        worker_counts = [1]
+
+    print(f"{engine.dialect.name}: {args.bills} due bills over {args.users} users")
+    print(f"{'batch':>6} {'workers':>8} {'bills/s':>10} {'seconds':>8}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        for workers in worker_counts:
+            seed(args.bills, args.users)
+            result = autopay.run(batch_size=batch_size, workers=workers)
+            check(args.bills)
+            print(f"{batch_size:>6} {workers:>8} {result.bills_per_second:>10.0f} "
+                  f"{result.seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
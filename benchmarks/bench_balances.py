@@ -0,0 +1,128 @@
+"""Concurrent balance writers: load-and-assign in Python (before) vs one
+UPDATE ... SET balance = balance + :delta RETURNING per account (after).
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_balances.py --threads 1,8,32
+    python benchmarks/bench_balances.py            # local SQLite
+
+Each thread writes `--ops` transactions, each moving money on two random
+accounts out of `--accounts` (one debit, one credit, coalesced per account).
+Few accounts and many threads is the contended case. After every run the
+balances must equal the sum of the committed deltas; the old path drifts as
+soon as writers overlap, the atomic path must not.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_balances.db')}")
+
+from sqlalchemy import insert, select
+
+from balances import BalanceDeltas, apply_balances
+from database import Base, engine, SessionLocal
+from models import User, Account
+
+USER_ID = 1
+
+
+def seed(accounts):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "name": "bench", "email": "bench@example.com",
+                                     "password": "x", "phone": "9000000001"}])
+        conn.execute(insert(Account), [
+            {"id": a, "user_id": USER_ID, "bank_name": "Bench", "account_type": "savings",
+             "balance": 0}
+            for a in range(1, accounts + 1)
+        ])
+
+
+def load_and_assign(db, moves):
+    # what create_transaction / redeem_rewards did before
+    for account_id, amount in moves:
+        account = db.scalar(select(Account).where(
+            Account.id == account_id, Account.user_id == USER_ID
+        ))
+        account.balance += amount
+
+
+def atomic(db, moves):
+    deltas = BalanceDeltas()
+    for account_id, amount in moves:
+        deltas.add(USER_ID, account_id, amount)
+    balances = apply_balances(db, deltas)
+    assert len(balances) == len(deltas.items)
+
+
+def hammer(threads, ops, accounts, fn):
+    expected = {a: 0 for a in range(1, accounts + 1)}
+    lock = threading.Lock()
+    failed = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        committed = {}
+        db = SessionLocal()
+        try:
+            for _ in range(ops):
+                src, dst = rng.randint(1, accounts), rng.randint(1, accounts)
+                amount = rng.randint(1, 500)
+                moves = [(src, -amount), (dst, amount)]
+                try:
+                    fn(db, moves)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    failed.append(1)
+                    continue
+                for account_id, delta in moves:
+                    committed[account_id] = committed.get(account_id, 0) + delta
+        finally:
+            db.close()
+        with lock:
+            for account_id, delta in committed.items():
+                expected[account_id] += delta
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        actual = dict(conn.execute(select(Account.id, Account.balance)).all())
+    drift = sum(abs(actual[a] - expected[a]) for a in expected)
+    committed = threads * ops - len(failed)
+    return committed / seconds, len(failed), drift
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--ops", type=int, default=200, help="transactions per thread")
+    parser.add_argument("--accounts", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{engine.dialect.name}: {args.ops} two-account writes per thread "
+          f"over {args.accounts} accounts")
+    print(f"{'threads':>7} {'path':<16} {'txn/s':>9} {'failed':>7} {'drift':>10}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        for name, fn in (("load-and-assign", load_and_assign), ("atomic update", atomic)):
+            seed(args.accounts)
+            rate, failed, drift = hammer(threads, args.ops, args.accounts, fn)
+            print(f"{threads:>7} {name:<16} {rate:>9.0f} {failed:>7} {drift:>10.2f}")
+            if fn is atomic:
+                assert drift < 0.005, f"atomic updates drifted by {drift}"
+
+
+if __name__ == "__main__":
+    main()
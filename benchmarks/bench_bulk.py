@@ -0,0 +1,117 @@
+"""Transaction ingest from one client: POST /transactions/ per item (before)
+vs POST /transactions/bulk batches (after), in transactions per second.
+
+    python benchmarks/bench_bulk.py --total 20000 --batch-sizes 100,1000,5000
+    DATABASE_URL=postgresql://... python benchmarks/bench_bulk.py
+
+Boots main.app in-process (FastAPI TestClient), so the numbers include
+request validation, routing and JSON encoding but no network. The single-item
+path runs on a smaller sample (--single) since it is orders slower. After
+every run the account balance is checked against the inserted amounts.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read them; the local database starts fresh
+if "DATABASE_URL" not in os.environ:
+    DB_PATH = os.path.abspath("bench_bulk.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+MERCHANTS = ["swiggy", "zomato", "amazon", "flipkart", "uber", "ola", "apollo", "unknown shop"]
+
+
+def login(client):
+    email, password = "bulk@example.com", "bench-password"
+    client.post("/users/register", json={
+        "name": "bulk", "email": email, "password": password, "phone": "9000000002",
+    })
+    token = client.post(
+        "/users/login", data={"username": email, "password": password}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def new_account(client, headers):
+    return client.post("/accounts/", json={
+        "bank_name": "Bench", "account_type": "savings", "balance": 0,
+    }, headers=headers).json()["id"]
+
+
+def items(account_id, count, rng):
+    return [
+        {"account_id": account_id, "amount": round(rng.uniform(10, 900), 2),
+         "txn_type": rng.choice(["debit", "credit"]), "description": "bench",
+         "merchant": rng.choice(MERCHANTS)}
+        for _ in range(count)
+    ]
+
+
+def expected_balance(payload):
+    return sum(i["amount"] if i["txn_type"] == "credit" else -i["amount"] for i in payload)
+
+
+def check(client, headers, account_id, payload):
+    accounts = client.get("/accounts/", headers=headers).json()
+    balance = next(a["balance"] for a in accounts if a["id"] == account_id)
+    assert abs(balance - expected_balance(payload)) < 0.01, (balance, expected_balance(payload))
+
+
+def run_single(client, headers, payload):
+    start = time.perf_counter()
+    for item in payload:
+        response = client.post("/transactions/", json=item, headers=headers)
+        assert response.status_code == 200, response.text
+    return len(payload) / (time.perf_counter() - start)
+
+
+def run_bulk(client, headers, payload, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(payload), batch_size):
+        response = client.post("/transactions/bulk", json=payload[i:i + batch_size],
+                               headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["rejected"] == 0
+    return len(payload) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=20000, help="transactions per bulk run")
+    parser.add_argument("--single", type=int, default=500, help="transactions for POST /")
+    parser.add_argument("--batch-sizes", default="100,1000,5000")
+    args = parser.parse_args()
+
+    rng = random.Random(22)
+    with TestClient(app) as client:
+        headers = login(client)
+
+        print(f"{'path':<24} {'txn/s':>9}")
+        account_id = new_account(client, headers)
+        payload = items(account_id, args.single, rng)
+        rate = run_single(client, headers, payload)
+        check(client, headers, account_id, payload)
+        print(f"{'POST /transactions/':<24} {rate:>9.0f}")
+
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            account_id = new_account(client, headers)
+            payload = items(account_id, args.total, rng)
+            rate = run_bulk(client, headers, payload, batch_size)
+            check(client, headers, account_id, payload)
+            print(f"{f'bulk x{batch_size}':<24} {rate:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Per-transaction categorization cost as the category/keyword set grows.
+
+Compares the old path (read the whole categories table and scan every keyword
+for each transaction) against the compiled KeywordMatcher, both against an
+in-memory SQLite copy of the categories table.
+
+    python benchmarks/bench_categorize.py [--txns 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Category
+from categorizer import KeywordMatcher, match_text, get_category_matcher
+
+SIZES = [(10, 5), (50, 10), (200, 10), (500, 20)]
+
+
+def legacy_category(db, merchant, description):
+    text = match_text(merchant, description)
+    for cat in db.query(Category).all():
+        if cat.keywords:
+            for word in cat.keywords.split(","):
+                word = word.strip().lower()
+                if word and word in text:
+                    return cat.name
+
+
+def random_word(rng, n=7):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def seed(db, rng, n_categories, n_keywords):
+    db.query(Category).delete()
+    vocab = []
+    for i in range(n_categories):
+        words = [random_word(rng) for _ in range(n_keywords)]
+        vocab.extend(words)
+        db.add(Category(name=f"cat_{i}", keywords=",".join(words)))
+    db.commit()
+    return vocab
+
+
+def make_texts(rng, vocab, count):
+    texts = []
+    for _ in range(count):
+        # roughly half the transactions hit a keyword
+        merchant = rng.choice(vocab) if rng.random() < 0.5 else random_word(rng)
+        description = " ".join(random_word(rng, 5) for _ in range(4))
+        texts.append((merchant.upper(), description))
+    return texts
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    out = [fn(m, d) for m, d in texts]
+    return (time.perf_counter() - start) / len(texts) * 1e6, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--txns", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Category.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(42)
+
+    print(f"{'categories':>10} {'keywords':>9} {'legacy us/txn':>14} "
+          f"{'compiled us/txn':>16} {'speedup':>8}")
+
+    for n_categories, n_keywords in SIZES:
+        vocab = seed(db, rng, n_categories, n_keywords)
+        texts = make_texts(rng, vocab, args.txns)
+
+        legacy_us, legacy_out = timed(
+            lambda m, d: legacy_category(db, m, d), texts
+        )
+
+        # includes the (single) build from the table
+        start = time.perf_counter()
+        matcher = KeywordMatcher(
+            db.query(Category.name, Category.keywords).order_by(Category.id).all()
+        )
+        build_ms = (time.perf_counter() - start) * 1e3
+        compiled_us, compiled_out = timed(matcher.categorize, texts)
+
+        assert legacy_out == compiled_out, "matcher disagrees with legacy scan"
+
+        print(f"{n_categories:>10} {n_categories * n_keywords:>9} "
+              f"{legacy_us:>14.1f} {compiled_us:>16.2f} "
+              f"{legacy_us / compiled_us:>7.0f}x   (build {build_ms:.1f} ms)")
+
+    # cached lookup path used by auto_assign_category
+    get_category_matcher(db)
+    start = time.perf_counter()
+    for _ in range(args.txns):
+        get_category_matcher(db)
+    lookup_us = (time.perf_counter() - start) / args.txns * 1e6
+    print(f"cached matcher lookup: {lookup_us:.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Per-endpoint micro-benchmarks with a regression gate.
+
+Boots main.app in-process (FastAPI TestClient) against a seeded local SQLite
+database, grows the data set through each --sizes step (transactions for the
+benchmark user) and records p50/p95 latency and SQL statements per request
+for every route.
+
+    python benchmarks/bench_endpoints.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_endpoints.py --baseline benchmarks/baseline.json
+
+With --baseline the run exits 1 when a route issues more SQL statements than
+the baseline, or when its p50/p95 exceeds --threshold x baseline (ignoring
+differences under --min-delta-ms). Set DATABASE_URL to run against an empty
+Postgres database instead.
+
+benchmarks/baseline.json is the committed SQLite baseline, recorded with the
+default options. Statement counts carry over between machines; latencies do
+not, so re-record it on the machine that runs the gate, and in the same
+change as a route's expected cost moves.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read them; the local database starts fresh
+if "DATABASE_URL" not in os.environ:
+    DB_PATH = os.path.abspath("bench_endpoints.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select, func
+
+import rollup
+from database import engine, async_engine, SessionLocal
+from main import app
+from models import Account, Bill, Budget, Category, Reward, Transaction
+from routers.dashboard import summary_cache
+
+CATEGORIES = {
+    "Food": "swiggy, zomato, dominos",
+    "Travel": "uber, ola, irctc",
+    "Shopping": "amazon, flipkart, myntra",
+    "Bills": "electricity, broadband, gas",
+    "Fuel": "indian oil, hpcl, shell",
+    "Health": "apollo, pharmeasy, 1mg",
+}
+MERCHANTS = [kw.strip() for kws in CATEGORIES.values() for kw in kws.split(",")] + ["unknown shop"]
+CSV_ROWS = 200
+
+
+# ================= SQL COUNTING =================
+
+class StatementCounter:
+    def __init__(self, *engines):
+        self.count = 0
+        for e in engines:
+            event.listen(e, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+# ================= SEEDING =================
+
+def seed_user(client):
+    email = "bench@example.com"
+    password = "bench-password"
+    client.post("/users/register", json={
+        "name": "bench", "email": email, "password": password, "phone": "9000000001",
+    })
+    token = client.post(
+        "/users/login", data={"username": email, "password": password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    account_ids = [
+        client.post("/accounts/", json={
+            "bank_name": "Bench", "account_type": kind, "balance": 100000,
+        }, headers=headers).json()["id"]
+        for kind in ("savings", "current", "credit")
+    ]
+    user_id = _user_id(account_ids[0])
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(Category.name)).scalars())
+        conn.execute(insert(Category), [
+            {"name": name, "keywords": keywords}
+            for name, keywords in CATEGORIES.items() if name not in existing
+        ])
+        conn.execute(insert(Budget), [
+            {"user_id": user_id, "month": now.month, "year": now.year,
+             "category": name, "limit_amount": 5000}
+            for name in CATEGORIES
+        ])
+        conn.execute(insert(Reward), [{
+            "user_id": user_id, "program_name": "Bank Rewards", "points_balance": 10 ** 9,
+        }])
+    return user_id, account_ids, headers
+
+
+def _user_id(account_id):
+    with engine.connect() as conn:
+        return conn.execute(select(Account.user_id).where(Account.id == account_id)).scalar()
+
+
+def grow(user_id, account_ids, target, rng):
+    """Top the benchmark user up to `target` transactions (and target/50 bills)."""
+    with engine.connect() as conn:
+        current = conn.execute(
+            select(func.count(Transaction.id)).where(Transaction.account_id.in_(account_ids))
+        ).scalar()
+        bills = conn.execute(select(func.count(Bill.id)).where(Bill.user_id == user_id)).scalar()
+
+    now = datetime.utcnow()
+    rows = [{
+        "account_id": rng.choice(account_ids),
+        "amount": round(rng.uniform(10, 5000), 2),
+        "txn_type": "debit" if rng.random() < 0.8 else "credit",
+        "category": rng.choice(list(CATEGORIES) + [None]),
+        "merchant": rng.choice(MERCHANTS),
+        "txn_date": now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+    } for _ in range(max(0, target - current))]
+
+    with engine.begin() as conn:
+        for start in range(0, len(rows), 10000):
+            conn.execute(insert(Transaction), rows[start:start + 10000])
+        bill_rows = [{
+            "user_id": user_id, "biller_name": f"Biller {i}",
+            "due_date": (now + timedelta(days=rng.randint(-60, 60))).date(),
+            "amount_due": round(rng.uniform(100, 3000), 2),
+            "status": "pending", "auto_pay": rng.random() < 0.3,
+        } for i in range(bills, max(1, target // 50))]
+        if bill_rows:
+            conn.execute(insert(Bill), bill_rows)
+
+    db = SessionLocal()
+    try:
+        rollup.rebuild(db, user_id=user_id)
+    finally:
+        db.close()
+    summary_cache.clear()
+
+
+# ================= ROUTES =================
+
+def csv_payload(account_id, rng):
+    lines = ["account_id,amount,txn_type,description,merchant"]
+    lines += [
+        f"{account_id},{rng.uniform(10, 900):.2f},debit,bench,{rng.choice(MERCHANTS)}"
+        for _ in range(CSV_ROWS)
+    ]
+    return "\n".join(lines).encode()
+
+
+def bulk_payload(account_ids, rng):
+    return [
+        {"account_id": rng.choice(account_ids), "amount": round(rng.uniform(10, 900), 2),
+         "txn_type": "debit", "description": "bench", "merchant": rng.choice(MERCHANTS)}
+        for _ in range(CSV_ROWS)
+    ]
+
+
+def routes(account_ids, rng):
+    """(name, before-hook, request) triples; the writes go last since they add rows."""
+    now = datetime.utcnow()
+    recent = (now - timedelta(days=30)).date().isoformat()
+    return [
+        ("GET /transactions/", None,
+         lambda c, h: c.get("/transactions/", headers=h)),
+        ("GET /transactions/?limit=100", None,
+         lambda c, h: c.get("/transactions/", params={"limit": 100}, headers=h)),
+        ("GET /transactions/?stream=true", None,
+         lambda c, h: c.get("/transactions/", params={"stream": "true"}, headers=h)),
+        ("GET /transactions/search", None,
+         lambda c, h: c.get("/transactions/search",
+                            params={"q": "swig", "min_amount": 100}, headers=h)),
+        ("GET /transactions/export.csv (30d)", None,
+         lambda c, h: c.get("/transactions/export.csv", params={"from": recent}, headers=h)),
+        ("GET /transactions/category-summary", None,
+         lambda c, h: c.get("/transactions/category-summary", headers=h)),
+        ("GET /dashboard/summary (cold)", summary_cache.clear,
+         lambda c, h: c.get("/dashboard/summary", headers=h)),
+        ("GET /dashboard/summary (cached)", None,
+         lambda c, h: c.get("/dashboard/summary", headers=h)),
+        ("GET /budgets/progress", None,
+         lambda c, h: c.get("/budgets/progress",
+                            params={"month": now.month, "year": now.year}, headers=h)),
+        ("GET /bills/", None,
+         lambda c, h: c.get("/bills/", headers=h)),
+        ("GET /bills/due", None,
+         lambda c, h: c.get("/bills/due", headers=h)),
+        ("GET /analytics/spending-series (day)", None,
+         lambda c, h: c.get("/analytics/spending-series",
+                            params={"granularity": "day"}, headers=h)),
+        ("POST /rewards/redeem", None,
+         lambda c, h: c.post("/rewards/redeem",
+                             params={"account_id": account_ids[0], "points": 100}, headers=h)),
+        ("POST /transactions/upload-csv", None,
+         lambda c, h: c.post("/transactions/upload-csv", headers=h, files={
+             "file": ("bench.csv", csv_payload(account_ids[0], rng), "text/csv")})),
+        ("POST /transactions/bulk", None,
+         lambda c, h: c.post("/transactions/bulk", headers=h,
+                             json=bulk_payload(account_ids, rng))),
+    ]
+
+
+def measure(client, headers, counter, name, before, call, runs, warmup):
+    latencies, statements = [], []
+    for i in range(warmup + runs):
+        if before:
+            before()
+        counter.count = 0
+        start = time.perf_counter()
+        response = call(client, headers)
+        elapsed = (time.perf_counter() - start) * 1e3
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: {response.status_code} {response.text}")
+        if i >= warmup:
+            latencies.append(elapsed)
+            statements.append(counter.count)
+
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+        "sql_statements": max(statements),
+    }
+
+
+# ================= GATE =================
+
+def compare(results, baseline, threshold, min_delta_ms):
+    failures = []
+    for size, routes_ in results.items():
+        for name, current in routes_.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if current["sql_statements"] > base["sql_statements"]:
+                failures.append(f"[{size}] {name}: SQL statements "
+                                f"{base['sql_statements']} -> {current['sql_statements']}")
+            for metric in ("p50_ms", "p95_ms"):
+                if (current[metric] > base[metric] * threshold
+                        and current[metric] - base[metric] > min_delta_ms):
+                    failures.append(f"[{size}] {name}: {metric} "
+                                    f"{base[metric]} -> {current[metric]}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000",
+                        help="comma-separated transaction counts, grown in order")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--out", default="bench_endpoints.json")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to gate against")
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    counter = StatementCounter(engine, async_engine.sync_engine)
+    results = {}
+
+    with TestClient(app) as client:
+        user_id, account_ids, headers = seed_user(client)
+        for size in sorted(int(s) for s in args.sizes.split(",")):
+            grow(user_id, account_ids, size, rng)
+            print(f"\n{size} transactions")
+            print(f"{'route':<38} {'p50 ms':>9} {'p95 ms':>9} {'sql':>5}")
+            results[str(size)] = {}
+            for name, before, call in routes(account_ids, rng):
+                result = measure(client, headers, counter, name, before, call,
+                                 args.runs, args.warmup)
+                results[str(size)][name] = result
+                print(f"{name:<38} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['sql_statements']:>5}")
+
+    payload = {"dialect": engine.dialect.name, "results": results}
+    with open(args.out, "w") as f:
+        json.dump(payload, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nbaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        failures = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
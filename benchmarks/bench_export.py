@@ -0,0 +1,110 @@
+"""GET /transactions/export.csv: time to first byte, throughput and peak
+Python memory as the export grows.
+
+    python benchmarks/bench_export.py --sizes 1000,100000,1000000
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/bench_export.py
+
+Drives the endpoint's body generator directly (TestClient buffers whole
+responses, which would hide the streaming). Each size is its own account, so
+every export is one account's full history. Peak memory is measured in a
+separate pass under tracemalloc; it should stay flat across sizes.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_export.db')}")
+
+from sqlalchemy import insert, select, func
+
+from database import Base, engine
+from models import User, Account, Transaction
+from routers.transactions import _stream_csv
+
+
+def seed(sizes):
+    rng = random.Random(24)
+    now = datetime.utcnow()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "email": "bench@example.com",
+                                     "password": "x", "phone": "9000000001"}])
+        conn.execute(insert(Account), [
+            {"id": account_id, "user_id": 1, "bank_name": "Bench",
+             "account_type": "savings", "balance": 0}
+            for account_id in range(1, len(sizes) + 1)
+        ])
+    for account_id, size in enumerate(sizes, 1):
+        for start in range(0, size, 50000):
+            with engine.begin() as conn:
+                conn.execute(insert(Transaction), [{
+                    "account_id": account_id,
+                    "amount": round(rng.uniform(10, 5000), 2),
+                    "txn_type": rng.choice(["debit", "credit"]),
+                    "description": "bench payment",
+                    "merchant": rng.choice(["swiggy", "amazon", "uber", "apollo"]),
+                    "category": rng.choice(["Food", "Shopping", "Travel", None]),
+                    "txn_date": now - timedelta(minutes=start + i),
+                } for i in range(min(50000, size - start))])
+
+
+async def export(account_id):
+    """(seconds to the first data chunk, total seconds, bytes)."""
+    start = time.perf_counter()
+    first = None
+    size = 0
+    chunks = _stream_csv([account_id], None, None)
+    await chunks.__anext__()              # header
+    async for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, time.perf_counter() - start, size
+
+
+async def peak_memory(account_id):
+    gc.collect()
+    tracemalloc.start()
+    async for _ in _stream_csv([account_id], None, None):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        counts = dict(conn.execute(
+            select(Transaction.account_id, func.count(Transaction.id))
+            .group_by(Transaction.account_id)
+        ).all())
+    if [counts.get(i + 1, 0) for i in range(len(sizes))] != sizes:
+        seed(sizes)
+
+    print(f"{engine.dialect.name}: one account per size")
+    print(f"{'rows':>9} {'TTFB ms':>8} {'total s':>8} {'rows/s':>9} {'MB out':>7} {'peak MB':>8}")
+    for account_id, rows in enumerate(sizes, 1):
+        first, total, size = asyncio.run(export(account_id))
+        peak = asyncio.run(peak_memory(account_id))
+        print(f"{rows:>9} {first * 1e3:>8.1f} {total:>8.2f} {rows / total:>9.0f} "
+              f"{size / 2 ** 20:>7.1f} {peak / 2 ** 20:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Login throughput against a running server.
+
+    uvicorn main:app --workers 1 &
+    python benchmarks/bench_login.py --url http://localhost:8000 --concurrency 32
+
+Registers a throwaway user, fires --requests logins from --concurrency client
+threads and reports requests/second overall and per server core. A /
+(no-auth) probe runs alongside to show whether unrelated endpoints stay
+responsive while logins are hashing.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post(url, data, form=False):
+    if form:
+        body = urllib.parse.urlencode(data).encode()
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    else:
+        body = json.dumps(data).encode()
+        headers = {"Content-Type": "application/json"}
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+
+def timed_get(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--server-cores", type=int, default=os.cpu_count(),
+                        help="cores available to the server (for per-core numbers)")
+    args = parser.parse_args()
+
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    password = "bench-password"
+    post(f"{args.url}/users/register", {
+        "name": "bench", "email": email, "password": password,
+        "phone": str(uuid.uuid4().int)[:12],
+    })
+
+    login = lambda _: post(
+        f"{args.url}/users/login", {"username": email, "password": password}, form=True
+    )
+
+    with ThreadPoolExecutor(max_workers=args.concurrency + 1) as pool:
+        start = time.perf_counter()
+        logins = [pool.submit(login, i) for i in range(args.requests)]
+
+        probes = []
+        while not all(f.done() for f in logins):
+            probes.append(timed_get(f"{args.url}/"))
+            time.sleep(0.05)
+
+        statuses = [f.result() for f in logins]
+        elapsed = time.perf_counter() - start
+
+    ok = statuses.count(200)
+    rps = ok / elapsed
+    print(f"logins: {ok}/{len(statuses)} ok in {elapsed:.2f}s")
+    print(f"throughput: {rps:.1f} req/s, {rps / args.server_cores:.1f} req/s per core "
+          f"({args.server_cores} cores)")
+    if probes:
+        print(f"unrelated GET / during the storm: median {statistics.median(probes):.1f} ms, "
+              f"max {max(probes):.1f} ms over {len(probes)} probes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Reward points under concurrency: read-modify-write of the Reward row
+(before) vs append-only ledger accruals (after), plus parallel redemptions.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_points.py --threads 1,8,32
+    python benchmarks/bench_points.py            # local SQLite
+
+All threads credit the same user, the worst case for the old path. After each
+run the balance is checked against the accruals that committed: the
+read-modify-write path loses updates as soon as threads overlap, the ledger
+must match exactly. The redemption phase checks that parallel
+redeems never take the balance below zero.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_points.db')}")
+
+from sqlalchemy import insert, select
+
+import points
+from database import Base, engine, SessionLocal
+from models import User, Reward
+
+USER_ID = 1
+EARN = 3
+
+
+def seed():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "name": "bench", "email": "bench@example.com",
+                                     "password": "x", "phone": "9000000001"}])
+        conn.execute(insert(Reward), [{"user_id": USER_ID, "program_name": points.PROGRAM,
+                                       "points_balance": 0}])
+
+
+def read_modify_write(db):
+    # what create_transaction did before the ledger
+    reward = db.scalar(select(Reward).where(
+        Reward.user_id == USER_ID, Reward.program_name == points.PROGRAM
+    ))
+    reward.points_balance += EARN
+
+
+def ledger(db):
+    points.accrue(db, USER_ID, EARN, "debit")
+
+
+def hammer(threads, ops, fn):
+    """Run `fn` in its own transaction `ops` times on each of `threads` threads."""
+    counts = {"ok": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def worker():
+        ok = failed = 0
+        db = SessionLocal()
+        try:
+            for _ in range(ops):
+                try:
+                    result = fn(db)
+                    db.commit()
+                    ok += result is not False
+                    failed += result is False
+                except Exception:
+                    db.rollback()
+                    failed += 1
+        finally:
+            db.close()
+        with lock:
+            counts["ok"] += ok
+            counts["failed"] += failed
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return counts, time.perf_counter() - start
+
+
+def current_balance():
+    with SessionLocal() as db:
+        return points.balance(db, USER_ID)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--ops", type=int, default=200, help="accruals per thread")
+    parser.add_argument("--redeem", type=int, default=50, help="points per redemption")
+    args = parser.parse_args()
+
+    print(f"{engine.dialect.name}: {args.ops} accruals of {EARN} points per thread")
+    print(f"{'threads':>7} {'path':<18} {'ops/s':>9} {'failed':>7} {'lost pts':>9}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        for name, fn in (("read-modify-write", read_modify_write), ("ledger", ledger)):
+            seed()
+            counts, seconds = hammer(threads, args.ops, fn)
+            lost = counts["ok"] * EARN - current_balance()
+            print(f"{threads:>7} {name:<18} {counts['ok'] / seconds:>9.0f} "
+                  f"{counts['failed']:>7} {lost:>9}")
+            if name == "ledger":
+                assert lost == 0, f"ledger lost {lost} points"
+
+        # redeem everything in parallel: exactly floor(balance / redeem) succeed
+        start_balance = current_balance()
+        counts, _ = hammer(threads, args.ops,
+                           lambda db: points.redeem(db, USER_ID, args.redeem) is not None)
+        end_balance = current_balance()
+        redeemed = counts["ok"] * args.redeem
+        assert end_balance >= 0 and end_balance == start_balance - redeemed, \
+            (start_balance, redeemed, end_balance)
+        print(f"{threads:>7} {'redeem':<18} {counts['ok']:>9} redemptions, "
+              f"balance {start_balance} -> {end_balance}")
+
+        with SessionLocal() as db:
+            points.compact_all(db)
+        assert current_balance() == end_balance
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Seed a large dataset and record query plans + timings for the hot
+transaction queries, before (extract() predicates, no indexes) and after
+(half-open date ranges, composite indexes, monthly rollup).
+
+    python benchmarks/bench_queries.py --url postgresql://... --users 50 --txns 20000
+    python benchmarks/bench_queries.py --out after.json --compare baseline.json
+
+Results (plans and median/p95 ms per query) are written as JSON; with
+--compare the run fails when any median is slower than --threshold x baseline.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, func, extract, insert, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import User, Account, Transaction, MonthlySpend
+import rollup
+
+CATEGORIES = ["Food", "Travel", "Shopping", "Bills", "Fuel", "Health", None]
+NEW_INDEXES = [ix for ix in Transaction.__table__.indexes if ix.name != "ix_transactions_id"]
+
+
+# ================= SEEDING =================
+
+def seed(engine, users, txns_per_user, batch=10000):
+    rng = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=5 * 365)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": u, "name": f"user{u}", "email": f"user{u}@bench.local",
+             "password": "x", "phone": f"9{u:09d}"}
+            for u in range(1, users + 1)
+        ])
+        conn.execute(insert(Account), [
+            {"id": u * 2 + k, "user_id": u, "bank_name": "Bench",
+             "account_type": "savings", "balance": 0}
+            for u in range(1, users + 1) for k in (0, 1)
+        ])
+
+    rows = []
+    for u in range(1, users + 1):
+        for _ in range(txns_per_user):
+            rows.append({
+                "account_id": u * 2 + rng.randint(0, 1),
+                "amount": round(rng.uniform(10, 5000), 2),
+                "txn_type": "debit" if rng.random() < 0.8 else "credit",
+                "category": rng.choice(CATEGORIES),
+                "merchant": "merchant",
+                "txn_date": start + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60)),
+            })
+            if len(rows) >= batch:
+                with engine.begin() as conn:
+                    conn.execute(insert(Transaction), rows)
+                rows = []
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(insert(Transaction), rows)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        rollup.rebuild(db)
+    finally:
+        db.close()
+
+
+# ================= QUERIES =================
+
+def legacy_queries(user_id, year, month, category):
+    """Shapes used before: extract() predicates on the raw table."""
+    by_month = [
+        extract("month", Transaction.txn_date) == month,
+        extract("year", Transaction.txn_date) == year,
+    ]
+    return {
+        "dashboard_income": select(func.sum(Transaction.amount))
+            .join(Account)
+            .where(Account.user_id == user_id, Transaction.txn_type == "credit", *by_month),
+        "budget_spent": select(func.sum(Transaction.amount))
+            .where(Transaction.category == category, Transaction.txn_type == "debit", *by_month),
+        "category_summary": select(Transaction.category, func.sum(Transaction.amount))
+            .join(Account)
+            .where(Account.user_id == user_id, Transaction.txn_type == "debit")
+            .group_by(Transaction.category),
+        "account_page": select(Transaction)
+            .where(Transaction.account_id == user_id * 2)
+            .order_by(Transaction.txn_date.desc(), Transaction.id.desc())
+            .limit(100),
+    }
+
+
+def current_queries(user_id, year, month, category):
+    """Shapes used now: half-open ranges, composite indexes, the rollup."""
+    start, end = rollup.month_range(year, month)
+    in_month = [Transaction.txn_date >= start, Transaction.txn_date < end]
+    return {
+        "dashboard_income": select(func.sum(MonthlySpend.total))
+            .where(MonthlySpend.user_id == user_id, MonthlySpend.txn_type == "credit",
+                   MonthlySpend.year == year, MonthlySpend.month == month),
+        "dashboard_income_raw_range": select(func.sum(Transaction.amount))
+            .join(Account)
+            .where(Account.user_id == user_id, Transaction.txn_type == "credit", *in_month),
+        "budget_spent": select(func.sum(MonthlySpend.total))
+            .where(MonthlySpend.user_id == user_id, MonthlySpend.txn_type == "debit",
+                   MonthlySpend.category == category,
+                   MonthlySpend.year == year, MonthlySpend.month == month),
+        "budget_spent_raw_range": select(func.sum(Transaction.amount))
+            .join(Account)
+            .where(Account.user_id == user_id, Transaction.category == category,
+                   Transaction.txn_type == "debit", *in_month),
+        "category_summary": select(MonthlySpend.category, func.sum(MonthlySpend.total))
+            .where(MonthlySpend.user_id == user_id, MonthlySpend.txn_type == "debit")
+            .group_by(MonthlySpend.category),
+        "account_page": select(Transaction)
+            .where(Transaction.account_id == user_id * 2)
+            .order_by(Transaction.txn_date.desc(), Transaction.id.desc())
+            .limit(100),
+        "account_page_keyset": select(Transaction)
+            .where(Transaction.account_id == user_id * 2,
+                   tuple_(Transaction.txn_date, Transaction.id) < tuple_(start, 2 ** 31))
+            .order_by(Transaction.txn_date.desc(), Transaction.id.desc())
+            .limit(100),
+    }
+
+
+# ================= MEASURING =================
+
+def explain(conn, stmt):
+    compiled = stmt.compile(bind=conn)
+    params = compiled.construct_params()
+    if conn.dialect.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    else:
+        prefix = "EXPLAIN QUERY PLAN "
+
+    rows = conn.exec_driver_sql(prefix + compiled.string, params).fetchall()
+    return [" | ".join(str(col) for col in row) for row in rows]
+
+
+def measure(engine, queries, runs):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in queries.items():
+            conn.execute(stmt).fetchall()  # warm up
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                conn.execute(stmt).fetchall()
+                samples.append((time.perf_counter() - start) * 1e3)
+            samples.sort()
+            results[name] = {
+                "median_ms": round(statistics.median(samples), 3),
+                "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+                "plan": explain(conn, stmt),
+            }
+    return results
+
+
+def set_indexes(engine, present: bool):
+    for index in NEW_INDEXES:
+        if present:
+            index.create(bind=engine, checkfirst=True)
+        else:
+            index.drop(bind=engine, checkfirst=True)
+    # refresh planner statistics after the index change
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite:///bench_queries.db")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--txns", type=int, default=10000, help="per user")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--out", default="bench_queries.json")
+    parser.add_argument("--compare", default=None, help="baseline JSON to gate against")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if args.reseed:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        empty = conn.execute(select(func.count(Transaction.id))).scalar() == 0
+    if empty:
+        print(f"seeding {args.users} users x {args.txns} transactions ...")
+        seed(engine, args.users, args.txns)
+
+    user_id = max(1, args.users // 2)
+    probe = datetime.utcnow() - timedelta(days=40)
+    params = (user_id, probe.year, probe.month, "Food")
+
+    set_indexes(engine, present=False)
+    before = measure(engine, legacy_queries(*params), args.runs)
+    set_indexes(engine, present=True)
+    after = measure(engine, current_queries(*params), args.runs)
+
+    print(f"{'query':<28} {'before ms':>10} {'after ms':>10}")
+    for name in sorted(before.keys() | after.keys()):
+        b = before.get(name, {}).get("median_ms")
+        a = after.get(name, {}).get("median_ms")
+        print(f"{name:<28} {b if b is not None else '-':>10} {a if a is not None else '-':>10}")
+
+    with open(args.out, "w") as f:
+        json.dump({"dialect": engine.dialect.name, "before": before, "after": after}, f, indent=2)
+    print(f"plans and timings written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["after"]
+        regressions = [
+            name for name, result in after.items()
+            if name in baseline
+            and result["median_ms"] > baseline[name]["median_ms"] * args.threshold
+        ]
+        for name in regressions:
+            print(f"REGRESSION {name}: {baseline[name]['median_ms']} -> "
+                  f"{after[name]['median_ms']} ms")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""GET /transactions/search latency on a seeded dataset.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py --rows 2000000
+    python benchmarks/bench_search.py --rows 200000      # local SQLite
+
+Runs the endpoint's own query (search_query + keyset_order, first page) for
+one user and reports median / p95 milliseconds per scenario. On Postgres,
+--explain prints each plan to check that the pg_trgm indexes are used;
+SQLite has no trigram index and scans the user's rows.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# must be set before the app modules read it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.abspath('bench_search.db')}")
+
+from sqlalchemy import insert, select, func, text
+
+from database import Base, engine
+from migrate import create_search_indexes
+from models import User, Account, Transaction
+from pagination import DEFAULT_PAGE_SIZE, keyset_order
+from routers.transactions import search_query
+
+MERCHANTS = ["Swiggy", "Zomato", "Amazon", "Flipkart", "Uber", "Ola", "Apollo Pharmacy",
+             "BigBasket", "IRCTC", "Netflix", "Spotify", "Shell Petrol", "Starbucks"]
+WORDS = ["order", "ride", "refund", "monthly", "subscription", "groceries", "ticket",
+         "dinner", "fuel", "medicine", "coffee", "gift", "transfer", "rent"]
+CATEGORIES = ["Food", "Shopping", "Travel", "Health", "Bills", "Entertainment", None]
+
+USER_ID = 1
+SCENARIOS = {
+    "q=swiggy": dict(q="swiggy"),
+    "q=refund": dict(q="refund"),
+    "q=xyzzy (no match)": dict(q="xyzzy"),
+    "q=uber + last 90 days": dict(q="uber", from_date=date.today() - timedelta(days=90)),
+    "q=amazon + amount>=1000": dict(q="amazon", min_amount=1000),
+    "category + debit": dict(category="Food", txn_type="debit"),
+    "last 30 days": dict(from_date=date.today() - timedelta(days=30)),
+}
+
+
+def seed(rows, users):
+    rng = random.Random(21)
+    now = datetime.utcnow()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": u, "name": f"user{u}", "email": f"user{u}@example.com",
+             "password": "x", "phone": f"9{u:09d}"}
+            for u in range(1, users + 1)
+        ])
+        conn.execute(insert(Account), [
+            {"id": u, "user_id": u, "bank_name": "Bench", "account_type": "savings",
+             "balance": 0}
+            for u in range(1, users + 1)
+        ])
+    batch = 50000
+    for start in range(0, rows, batch):
+        with engine.begin() as conn:
+            conn.execute(insert(Transaction), [{
+                "account_id": rng.randint(1, users),
+                "amount": round(rng.uniform(10, 5000), 2),
+                "txn_type": rng.choice(["debit", "debit", "debit", "credit"]),
+                "merchant": rng.choice(MERCHANTS),
+                "description": " ".join(rng.sample(WORDS, 3)),
+                "category": rng.choice(CATEGORIES),
+                "txn_date": now - timedelta(minutes=rng.randint(0, 60 * 24 * 730)),
+            } for _ in range(min(batch, rows - start))])
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # the trigram indexes are a migration, not part of create_all
+        create_search_indexes(conn)
+        # planner statistics, as a live database would have
+        conn.execute(text("ANALYZE"))
+
+
+def measure(query, runs):
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(runs):
+            start = time.perf_counter()
+            rows = conn.execute(query).all()
+            timings.append((time.perf_counter() - start) * 1e3)
+    timings.sort()
+    return len(rows), statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def explain(query):
+    with engine.connect() as conn:
+        compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+        return [row[0] for row in conn.execute(text(f"EXPLAIN {compiled}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="print Postgres plans")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count(Transaction.id))).scalar()
+    if existing != args.rows:
+        seed(args.rows, args.users)
+
+    print(f"{engine.dialect.name}: {args.rows} transactions over {args.users} users, "
+          f"first page of {DEFAULT_PAGE_SIZE}")
+    print(f"{'scenario':<26} {'rows':>5} {'median ms':>10} {'p95 ms':>8}")
+    for name, filters in SCENARIOS.items():
+        query = keyset_order(search_query(USER_ID, **filters)).limit(DEFAULT_PAGE_SIZE)
+        rows, median, p95 = measure(query, args.runs)
+        print(f"{name:<26} {rows:>5} {median:>10.2f} {p95:>8.2f}")
+        if args.explain and engine.dialect.name == "postgresql":
+            for line in explain(query):
+                print(f"    {line}")
+
+
+if __name__ == "__main__":
+    main()
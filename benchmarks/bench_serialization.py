@@ -0,0 +1,122 @@
+"""Transaction list serialization: ORM + pydantic + stdlib json (before) vs
+column tuples + orjson (after). Reports rows/second and peak Python memory.
+
+    python benchmarks/bench_serialization.py --rows 1000,10000,50000
+
+Both paths run the same query against a seeded local SQLite database on the
+sync engine, so the difference is hydration, validation and encoding.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import Session
+
+from database import Base
+from fast_json import rows_to_dicts
+from models import User, Account, Transaction
+from routers.transactions import TRANSACTION_COLUMNS
+from schemas import TransactionResponse
+
+
+def seed(engine, rows):
+    rng = random.Random(16)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "email": "bench@example.com",
+                                     "password": "x", "phone": "9000000001"}])
+        conn.execute(insert(Account), [{"id": 1, "user_id": 1, "bank_name": "Bench",
+                                        "account_type": "savings", "balance": 0}])
+        conn.execute(insert(Transaction), [{
+            "account_id": 1,
+            "amount": round(rng.uniform(10, 5000), 2),
+            "txn_type": rng.choice(["debit", "credit"]),
+            "description": "bench payment",
+            "merchant": rng.choice(["swiggy", "amazon", "uber", "apollo"]),
+            "category": rng.choice(["Food", "Shopping", "Travel", None]),
+            "txn_date": now - timedelta(minutes=i),
+        } for i in range(rows)])
+
+
+def orm_pydantic_json(db, limit):
+    txns = db.scalars(
+        select(Transaction)
+        .order_by(Transaction.txn_date.desc(), Transaction.id.desc())
+        .limit(limit)
+    ).all()
+    payload = [TransactionResponse.model_validate(t).model_dump(mode="json") for t in txns]
+    return json.dumps(payload).encode()
+
+
+def columns_orjson(db, limit):
+    rows = db.execute(
+        select(*TRANSACTION_COLUMNS)
+        .order_by(Transaction.txn_date.desc(), Transaction.id.desc())
+        .limit(limit)
+    ).all()
+    return orjson.dumps(rows_to_dicts(rows))
+
+
+def measure(engine, fn, limit, runs):
+    timings = []
+    for _ in range(runs):
+        with Session(engine) as db:
+            gc.collect()
+            start = time.perf_counter()
+            body = fn(db, limit)
+            timings.append(time.perf_counter() - start)
+
+    with Session(engine) as db:
+        gc.collect()
+        tracemalloc.start()
+        fn(db, limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    return {"rows_per_s": limit / seconds, "ms": seconds * 1e3,
+            "peak_mb": peak / 2 ** 20, "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite:///bench_serialization.db")
+    parser.add_argument("--rows", default="1000,10000,50000")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    sizes = sorted(int(r) for r in args.rows.split(","))
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count(Transaction.id))).scalar()
+    if existing < sizes[-1]:
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        seed(engine, sizes[-1])
+
+    with Session(engine) as db:
+        assert json.loads(orm_pydantic_json(db, 50)) == json.loads(columns_orjson(db, 50))
+
+    print(f"{'rows':>7} {'path':<20} {'rows/s':>11} {'ms':>9} {'peak MB':>9}")
+    for limit in sizes:
+        for name, fn in (("orm+pydantic+json", orm_pydantic_json),
+                         ("columns+orjson", columns_orjson)):
+            r = measure(engine, fn, limit, args.runs)
+            print(f"{limit:>7} {name:<20} {r['rows_per_s']:>11.0f} {r['ms']:>9.1f} "
+                  f"{r['peak_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
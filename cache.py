@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+MISSING = object()
+
+# every cache ever constructed, for metrics
+_all_caches = []
+
+
+# ================= TTL / LRU CACHE =================
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 30):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        _all_caches.append(self)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key) -> int:
+        """Read before computing a value; pass to set() so a result computed
+        across an invalidation is not stored."""
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def set(self, key, value, generation: int = None, ttl: float = None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+
+            expires = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def all_cache_stats() -> list[dict]:
+    return [cache.stats() for cache in _all_caches]
+
+
+# ================= PER-USER INVALIDATION =================
+
+# caches keyed by user id, dropped when a write for that user commits
+_user_caches = []
+
+
+def register_user_cache(cache: TTLCache) -> TTLCache:
+    _user_caches.append(cache)
+    return cache
+
+
+def touch_user(db, user_id: int):
+    """Mark `user_id` as changed; their cached reads are dropped on commit."""
+    db.info.setdefault("touched_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_touched_users(session):
+    for user_id in session.info.pop("touched_users", ()):
+        for cache in _user_caches:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched_users(session):
+    session.info.pop("touched_users", None)
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import select
+
+from models import Category
+
+# ================= CONFIG =================
+
+# other worker processes don't see our invalidations, so a matcher is also
+# rebuilt once it gets older than this
+MATCHER_MAX_AGE_SECONDS = 60
+
+# Transaction.category_source: the matcher's output, a user's own choice,
+# or a category the app assigns itself (Rewards, Bills). Only matcher output
+# is ever re-categorized.
+SOURCE_AUTO = "auto"
+SOURCE_MANUAL = "manual"
+SOURCE_SYSTEM = "system"
+
+
+# ================= MATCHER =================
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every category keyword.
+
+    A match returns the first category (in table order) that has any of its
+    keywords as a substring of the text, same as scanning the table row by
+    row, but in one pass over the text regardless of how many keywords exist.
+    """
+
+    def __init__(self, categories, version: int = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.names = []
+
+        # state 0 is the root; each state has a goto map, a fail link and the
+        # best (lowest) category rank that ends at it
+        self._goto = [{}]
+        self._fail = [0]
+        self._rank = [None]
+
+        for name, keywords in categories:
+            rank = len(self.names)
+            self.names.append(name)
+
+            for word in (keywords or "").split(","):
+                word = word.strip().lower()
+                if word:
+                    self._add(word, rank)
+
+        self._link()
+
+    def _add(self, word, rank):
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._rank.append(None)
+                self._goto[state][ch] = nxt
+            state = nxt
+
+        if self._rank[state] is None or rank < self._rank[state]:
+            self._rank[state] = rank
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+
+                # inherit matches that end here via the suffix link
+                inherited = self._rank[self._fail[nxt]]
+                if inherited is not None and (
+                    self._rank[nxt] is None or inherited < self._rank[nxt]
+                ):
+                    self._rank[nxt] = inherited
+
+                queue.append(nxt)
+
+    def match(self, text: str):
+        goto, fail, ranks = self._goto, self._fail, self._rank
+        best = None
+        state = 0
+
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            rank = ranks[state]
+            if rank is not None and (best is None or rank < best):
+                best = rank
+                if best == 0:
+                    break
+
+        return None if best is None else self.names[best]
+
+    def categorize(self, merchant, description):
+        return self.match(match_text(merchant, description))
+
+
+def match_text(merchant, description) -> str:
+    text = ""
+
+    # take merchant and description text
+    if merchant:
+        text += merchant.lower() + " "
+    if description:
+        text += description.lower()
+
+    return text
+
+
+# ================= PROCESS-WIDE CACHE =================
+# Category rows are always loaded outside the lock (never block other
+# threads, or the event loop, on a query); the lock only guards the swap.
+
+_lock = threading.Lock()
+_version = 0
+_matcher = None
+
+
+def invalidate_category_matcher():
+    """Call after any commit that changes the categories table."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _is_fresh(matcher) -> bool:
+    return (
+        matcher is not None
+        and matcher.version == _version
+        and time.monotonic() - matcher.built_at < MATCHER_MAX_AGE_SECONDS
+    )
+
+
+def _category_rows_query():
+    return select(Category.name, Category.keywords).order_by(Category.id)
+
+
+def get_category_matcher(db) -> KeywordMatcher:
+    """Cached matcher; `db` is a sync Session (jobs, ingest, CLI tools)."""
+    matcher = _matcher
+    if _is_fresh(matcher):
+        return matcher
+
+    # read the version first: an invalidation during the load leaves the
+    # new matcher stale, so the next caller rebuilds it again
+    version = _version
+    rows = db.execute(_category_rows_query()).all()
+    return _install(rows, version)
+
+
+async def get_category_matcher_async(db) -> KeywordMatcher:
+    """Same as get_category_matcher, for an AsyncSession in request handlers."""
+    matcher = _matcher
+    if _is_fresh(matcher):
+        return matcher
+
+    version = _version
+    rows = (await db.execute(_category_rows_query())).all()
+    return _install(rows, version)
+
+
+def _install(rows, version: int) -> KeywordMatcher:
+    global _matcher
+    with _lock:
+        # concurrent callers all saw the stale matcher; only the first to
+        # get here builds, the rest take its result
+        if _is_fresh(_matcher):
+            return _matcher
+        _matcher = KeywordMatcher(rows, version)
+        return _matcher
@@ -0,0 +1,313 @@
+import csv
+import io
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import insert
+
+from models import Account, Transaction
+from categorizer import get_category_matcher, SOURCE_AUTO
+from rollup import RollupDeltas, apply_rollup
+from balances import BalanceDeltas, apply_balances
+from cache import touch_user
+from points import accrue
+
+# ================= CONFIG =================
+
+CHUNK_SIZE = 5000
+# items accepted by one POST /transactions/bulk
+BULK_MAX_ITEMS = 10000
+# bound parameters per SQLite statement (SQLITE_MAX_VARIABLE_NUMBER)
+SQLITE_MAX_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999
+
+TXN_COLUMNS = (
+    "account_id", "amount", "txn_type", "description",
+    "merchant", "category", "category_source", "txn_date"
+)
+
+
+@dataclass
+class IngestResult:
+    created: int = 0
+    skipped: int = 0
+    balance_deltas: dict = field(default_factory=dict)
+    points: int = 0
+    rollup: RollupDeltas = field(default_factory=RollupDeltas)
+
+    def merge(self, other: "IngestResult"):
+        self.created += other.created
+        self.skipped += other.skipped
+        self.points += other.points
+        self.rollup.merge(other.rollup)
+        for account_id, delta in other.balance_deltas.items():
+            self.balance_deltas[account_id] = (
+                self.balance_deltas.get(account_id, 0) + delta
+            )
+
+
+# ================= PARSING =================
+
+def iter_csv_chunks(fileobj, chunk_size: int = CHUNK_SIZE):
+    """Yield lists of CSV rows without reading the whole upload into memory."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # leave the underlying upload open for its owner; when the generator
+        # is collected after the owner closed it there is nothing to leave
+        if not fileobj.closed:
+            text.detach()
+
+
+def parse_chunk(rows, user_id, owned_ids, matcher, txn_date):
+    """Turn raw CSV rows into insertable records plus aggregated deltas.
+
+    Pure function (no DB access) so it can run in a worker process.
+    """
+    result = IngestResult()
+    records = []
+
+    for row in rows:
+        try:
+            account_id = int(row["account_id"])
+            amount = float(row["amount"])
+            txn_type = row["txn_type"].lower()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            result.skipped += 1
+            continue
+
+        if account_id not in owned_ids:
+            result.skipped += 1
+            continue
+
+        if txn_type == "credit":
+            delta = amount
+        elif txn_type == "debit":
+            delta = -amount
+            # 🔥 Reward for CSV debit
+            result.points += int(amount // 100)
+        else:
+            result.skipped += 1
+            continue
+
+        description = row.get("description")
+        merchant = row.get("merchant")
+        category = matcher.categorize(merchant, description)
+
+        records.append({
+            "account_id": account_id,
+            "amount": amount,
+            "txn_type": txn_type,
+            "description": description,
+            "merchant": merchant,
+            "category": category,
+            "category_source": SOURCE_AUTO,
+            "txn_date": txn_date,
+        })
+
+        result.balance_deltas[account_id] = (
+            result.balance_deltas.get(account_id, 0) + delta
+        )
+        result.rollup.add(
+            user_id, account_id, txn_date, category, txn_type, amount
+        )
+
+    result.created = len(records)
+    return records, result
+
+
+def parse_items(items, user_id, owned_ids, matcher, now):
+    """Bulk JSON counterpart of parse_chunk for TransactionCreate items.
+
+    Also returns one result dict per item, in order: rejected items carry
+    their error, accepted ones get their id filled in after the insert.
+    """
+    result = IngestResult()
+    records = []
+    outcomes = []
+
+    for index, item in enumerate(items):
+        txn_type = item.txn_type.lower()
+
+        if item.account_id not in owned_ids:
+            error = "Account not found"
+        elif txn_type not in ("credit", "debit"):
+            error = "Invalid transaction type"
+        elif item.amount <= 0:
+            error = "Amount must be positive"
+        else:
+            error = None
+
+        if error:
+            result.skipped += 1
+            outcomes.append({"index": index, "status": "rejected", "error": error})
+            continue
+
+        if txn_type == "credit":
+            delta = item.amount
+        else:
+            delta = -item.amount
+            result.points += int(item.amount // 100)
+
+        category = matcher.categorize(item.merchant, item.description)
+        txn_date = item.txn_date or now
+
+        records.append({
+            "account_id": item.account_id,
+            "amount": item.amount,
+            "txn_type": txn_type,
+            "description": item.description,
+            "merchant": item.merchant,
+            "category": category,
+            "category_source": SOURCE_AUTO,
+            "currency": item.currency,
+            "txn_date": txn_date,
+        })
+        outcomes.append({"index": index, "status": "created", "id": None,
+                         "category": category})
+
+        result.balance_deltas[item.account_id] = (
+            result.balance_deltas.get(item.account_id, 0) + delta
+        )
+        result.rollup.add(
+            user_id, item.account_id, txn_date, category, txn_type, item.amount
+        )
+
+    result.created = len(records)
+    return records, result, outcomes
+
+
+# ================= WRITING =================
+
+def write_records(db, records):
+    if not records:
+        return
+
+    if db.get_bind().dialect.driver == "psycopg2":
+        _copy_records(db, records)
+    else:
+        # executemany (batched into multi-row VALUES by SQLAlchemy); keep
+        # NULLs in the statement, or rows with and without a category split
+        # the batch into one statement per run of equal key sets
+        db.execute(insert(Transaction).execution_options(render_nulls=True), records)
+
+
+def insert_returning_ids(db, records) -> list:
+    """Multi-row INSERT ... RETURNING id; ids come back in `records` order."""
+    if not records:
+        return []
+
+    if db.get_bind().dialect.name == "sqlite":
+        return _insert_consecutive_ids(db, records)
+
+    rows = db.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        records
+    )
+    return [row[0] for row in rows]
+
+
+def _insert_consecutive_ids(db, records) -> list:
+    # SQLite RETURNING order is unspecified, so SQLAlchemy sends one INSERT
+    # per row for sort_by_parameter_order. A multi-row INSERT holds the write
+    # lock for the whole statement and numbers its rows max(id)+1 onwards, so
+    # a statement's ids are the range ending at its lastrowid.
+    per_statement = max(1, SQLITE_MAX_PARAMS // len(records[0]))
+    ids = []
+    for start in range(0, len(records), per_statement):
+        batch = records[start:start + per_statement]
+        last_id = db.execute(insert(Transaction).values(batch)).lastrowid
+        ids.extend(range(last_id - len(batch) + 1, last_id + 1))
+    return ids
+
+
+def _copy_records(db, records):
+    buf = io.StringIO()
+    # QUOTE_NONNUMERIC keeps None (-> NULL) apart from empty strings
+    writer = csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC)
+    for record in records:
+        writer.writerow([record[col] for col in TXN_COLUMNS])
+    buf.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY transactions ({', '.join(TXN_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buf
+        )
+    finally:
+        cursor.close()
+
+
+def apply_totals(db, user_id: int, result: IngestResult, reason: str = "csv_upload"):
+    """One balance UPDATE per account and one points entry per upload."""
+    # accounts first, then the rollup: the lock order of every other writer
+    # (create_transaction, redeem, autopay), so they cannot deadlock
+    balances = BalanceDeltas()
+    for account_id, delta in result.balance_deltas.items():
+        balances.add(user_id, account_id, delta)
+    apply_balances(db, balances, returning=False)
+
+    apply_rollup(db, result.rollup)
+    touch_user(db, user_id)
+
+    # one ledger entry per upload; the Reward row is folded in by compaction
+    accrue(db, user_id, result.points, reason)
+
+
+# ================= PIPELINE =================
+
+def owned_account_ids(db, user_id: int) -> set:
+    rows = db.query(Account.id).filter(Account.user_id == user_id).all()
+    return {row[0] for row in rows}
+
+
+def ingest_csv(db, user_id: int, fileobj, chunk_size: int = CHUNK_SIZE):
+    """Stream a statement CSV into transactions in a single DB transaction."""
+    owned_ids = owned_account_ids(db, user_id)
+    matcher = get_category_matcher(db)
+    txn_date = datetime.utcnow()
+    total = IngestResult()
+
+    for rows in iter_csv_chunks(fileobj, chunk_size):
+        records, result = parse_chunk(
+            rows, user_id, owned_ids, matcher, txn_date
+        )
+        write_records(db, records)
+        total.merge(result)
+
+    apply_totals(db, user_id, total)
+    db.commit()
+    return total
+
+
+def ingest_items(db, user_id: int, items):
+    """Insert a batch of TransactionCreate items in one DB transaction.
+
+    Invalid items are rejected individually; the rest are categorized in
+    memory, inserted with multi-row statements and their balance, rollup and
+    points deltas applied once for the whole batch.
+    """
+    owned_ids = owned_account_ids(db, user_id)
+    matcher = get_category_matcher(db)
+
+    records, result, outcomes = parse_items(
+        items, user_id, owned_ids, matcher, datetime.utcnow()
+    )
+    ids = iter(insert_returning_ids(db, records))
+    for outcome in outcomes:
+        if outcome["status"] == "created":
+            outcome["id"] = next(ids)
+
+    if records:
+        apply_totals(db, user_id, result, reason="bulk")
+    db.commit()
+    return result, outcomes
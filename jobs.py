@@ -0,0 +1,355 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import BackgroundJob
+from categorizer import get_category_matcher
+from ingest import (
+    CHUNK_SIZE, iter_csv_chunks, parse_chunk,
+    write_records, apply_totals, owned_account_ids
+)
+import recategorize
+
+logger = logging.getLogger(__name__)
+
+# ================= CONFIG =================
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JOB_THREADS = 2
+PARSE_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+# chunks parsed ahead of the writer, per job
+PARSE_AHEAD = 2
+
+# seconds between heartbeats of the jobs this process holds, and without
+# one after which a queued / running job is failed (its worker is gone)
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "300"))
+
+_lock = threading.Lock()
+_job_executor = None
+_heartbeat_thread = None
+# ids of the jobs queued or running in this process
+_held = set()
+
+
+def job_executor() -> ThreadPoolExecutor:
+    global _job_executor
+    with _lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(
+                max_workers=JOB_THREADS, thread_name_prefix="job"
+            )
+        return _job_executor
+
+
+def _parse_pool(*context) -> ProcessPoolExecutor:
+    # one pool per ingest job: the matcher and the rest of the job's parse
+    # context are sent once per worker, not pickled with every chunk; no more
+    # workers than chunks in flight. spawn: never fork a process that holds
+    # DB connections and threads
+    return ProcessPoolExecutor(
+        max_workers=min(PARSE_PROCESSES, PARSE_AHEAD + 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_parse_worker,
+        initargs=context
+    )
+
+
+_parse_context = None
+
+
+def _init_parse_worker(*context):
+    global _parse_context
+    _parse_context = context
+
+
+def _parse_rows(rows):
+    user_id, owned_ids, matcher, txn_date = _parse_context
+    return parse_chunk(rows, user_id, owned_ids, matcher, txn_date)
+
+
+# ================= JOB RECORDS =================
+
+def create_job(db, user_id, kind: str) -> BackgroundJob:
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        kind=kind,
+        status="queued",
+        rows_processed=0,
+        rows_rejected=0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def active_job(db, kind: str):
+    return (
+        db.query(BackgroundJob)
+        .filter(BackgroundJob.kind == kind, BackgroundJob.status.in_(ACTIVE_STATUSES))
+        .order_by(BackgroundJob.created_at)
+        .first()
+    )
+
+
+def job_status(job: BackgroundJob) -> dict:
+    rate = 0.0
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rate = job.rows_processed / elapsed
+
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "rows_rejected": job.rows_rejected,
+        "rows_per_second": round(rate, 1),
+        "rows_total": job.rows_total,
+        "checkpoint": job.checkpoint,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _finish(job_id: str, status: str, error: str = None):
+    db = SessionLocal()
+    try:
+        job = db.get(BackgroundJob, job_id)
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+# ================= HEARTBEAT =================
+
+def hold(job_id: str):
+    """Heartbeat `job_id` from this process until release(job_id)."""
+    global _heartbeat_thread
+    with _lock:
+        _held.add(job_id)
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat_loop, name="job-heartbeat", daemon=True
+            )
+            _heartbeat_thread.start()
+
+
+def release(job_id: str):
+    with _lock:
+        _held.discard(job_id)
+
+
+def _submit(fn, job_id: str, *args):
+    hold(job_id)
+
+    def run():
+        try:
+            fn(job_id, *args)
+        finally:
+            release(job_id)
+
+    try:
+        job_executor().submit(run)
+    except BaseException:
+        release(job_id)
+        raise
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        try:
+            _beat()
+        except Exception:
+            logger.exception("job heartbeat failed")
+
+
+def _beat():
+    with _lock:
+        held = list(_held)
+
+    db = SessionLocal()
+    try:
+        if held:
+            db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id.in_(held))
+                .values(heartbeat_at=datetime.utcnow())
+            )
+        db.execute(_stale_jobs_update())
+        db.commit()
+    finally:
+        db.close()
+
+
+def _stale_jobs_update():
+    now = datetime.utcnow()
+    return (
+        update(BackgroundJob)
+        .where(
+            BackgroundJob.status.in_(ACTIVE_STATUSES),
+            func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.created_at)
+            < now - timedelta(seconds=STALE_AFTER)
+        )
+        .values(status="failed", error="worker stopped", finished_at=now)
+    )
+
+
+def is_stale(job: BackgroundJob) -> bool:
+    last = job.heartbeat_at or job.created_at
+    return (
+        job.status in ACTIVE_STATUSES
+        and last < datetime.utcnow() - timedelta(seconds=STALE_AFTER)
+    )
+
+
+def fail_stale_jobs(db) -> int:
+    """Fail queued / running jobs whose worker stopped heartbeating; they
+    can then be resumed (recategorize) or submitted again."""
+    count = db.execute(_stale_jobs_update()).rowcount
+    db.commit()
+    return count
+
+
+# ================= CSV INGEST JOB =================
+
+def submit_ingest_job(db, user_id: int, fileobj) -> BackgroundJob:
+    """Spool the upload to disk and ingest it on the job pool."""
+    spool = tempfile.NamedTemporaryFile(prefix="ingest-", suffix=".csv", delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(fileobj, spool)
+
+        job = create_job(db, user_id, "csv_ingest")
+        _submit(_run_ingest_job, job.id, user_id, spool.name)
+    except BaseException:
+        # no job took the file, so nothing else will delete it
+        os.unlink(spool.name)
+        raise
+    return job
+
+
+def _run_ingest_job(job_id: str, user_id: int, path: str):
+    db = SessionLocal()
+    try:
+        job = db.get(BackgroundJob, job_id)
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.heartbeat_at = job.started_at
+        db.commit()
+
+        owned_ids = owned_account_ids(db, user_id)
+        matcher = get_category_matcher(db)
+        txn_date = datetime.utcnow()
+        pending = deque()
+
+        with open(path, "rb") as fileobj, \
+                _parse_pool(user_id, owned_ids, matcher, txn_date) as pool:
+            chunks = iter_csv_chunks(fileobj, CHUNK_SIZE)
+
+            for rows in chunks:
+                pending.append(pool.submit(_parse_rows, rows))
+                if len(pending) > PARSE_AHEAD:
+                    _commit_chunk(db, job, user_id, pending.popleft().result())
+
+            while pending:
+                _commit_chunk(db, job, user_id, pending.popleft().result())
+
+        _finish(job_id, "done")
+
+    except Exception as exc:
+        # chunks committed so far stay committed
+        db.rollback()
+        _finish(job_id, "failed", str(exc))
+
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+def _commit_chunk(db, job, user_id: int, parsed):
+    records, result = parsed
+
+    write_records(db, records)
+    apply_totals(db, user_id, result)
+
+    job.rows_processed += result.created
+    job.rows_rejected += result.skipped
+    db.commit()
+
+
+# ================= RE-CATEGORIZATION JOB =================
+
+# one at a time: two full rescans would race on the same rows and rollup,
+# and would hold both job threads (starving CSV ingest); the partial unique
+# index uq_background_jobs_active_recategorize enforces it across workers
+
+def submit_recategorize_job(db, user_id: int):
+    """Queue a full rescan, or return the job already queued or running.
+
+    A queued job is as good as a new one (it picks up the latest keywords
+    when it starts); callers check the status of what they get back. None
+    when the insert lost the race twice in a row (the caller answers 409).
+    """
+    fail_stale_jobs(db)
+    # a lost race is retried once: the winner may be done by the time we look
+    for _ in range(2):
+        job = active_job(db, recategorize.KIND)
+        if job is not None:
+            return job
+
+        try:
+            job = create_job(db, user_id, recategorize.KIND)
+        except IntegrityError:
+            # another request queued one since the check above
+            db.rollback()
+            continue
+
+        _submit(recategorize.run_job, job.id)
+        return job
+
+    return None
+
+
+def resume_recategorize_job(db, job: BackgroundJob):
+    """Continue a failed job after its last committed chunk; None when
+    another re-categorization is queued or running."""
+    for _ in range(2):
+        job.status = "queued"
+        job.error = None
+        job.heartbeat_at = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            # retried once if the job that blocked it has finished since
+            if active_job(db, recategorize.KIND) is not None:
+                return None
+            continue
+
+        _submit(recategorize.run_job, job.id)
+        return job
+
+    return None
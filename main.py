@@ -1,12 +1,39 @@
-from fastapi import FastAPI
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine
+from database import pool_stats
 import models
-from routers import users, accounts, transactions, categorize,budgets,bills,dashboard,rewards
+from pagination import NEXT_CURSOR_HEADER
+import metrics
+import query_diagnostics
+import autopay
+import migrate
+from auth import get_metrics_reader
+from routers import users, accounts, transactions, categorize,budgets,bills,dashboard,rewards,analytics
+
+# creates missing tables only; columns, indexes and backfills for tables
+# that already hold data are migrations, see migrate.py (a new database
+# starts with them recorded as applied)
+migrate.create_schema()
+migrate.warn_pending()
+
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app):
+    stop = threading.Event()
+    if autopay.AUTOPAY_INTERVAL > 0:
+        # every instance may run this: SKIP LOCKED keeps them from paying twice
+        threading.Thread(
+            target=autopay.serve, args=(autopay.AUTOPAY_INTERVAL,),
+            kwargs={"stop": stop}, name="autopay", daemon=True
+        ).start()
+    yield
+    stop.set()
 
-app = FastAPI(title="Modern Digital Banking Dashboard")
+
+app = FastAPI(title="Modern Digital Banking Dashboard", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,7 +41,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(query_diagnostics.QueryDiagnosticsMiddleware)
+# outermost, so it also times CORS handling and sees every status code
+app.add_middleware(metrics.MetricsMiddleware)
 app.include_router(users.router,prefix="/users")
 app.include_router(accounts.router,prefix="/accounts")
 app.include_router(transactions.router)
@@ -24,6 +55,9 @@ app.include_router(bills.router)
 app.include_router(rewards.router)
 
 app.include_router(dashboard.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+app.include_router(query_diagnostics.router)
 
 
 
@@ -31,4 +65,9 @@ app.include_router(dashboard.router)
 
 @app.get("/")
 def root():
-    return {"message": "Backend running"}
\ No newline at end of file
+    return {"message": "Backend running"}
+
+
+@app.get("/metrics/pool")
+def pool_metrics(reader=Depends(get_metrics_reader)):
+    return pool_stats()
\ No newline at end of file
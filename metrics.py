@@ -0,0 +1,239 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from auth import get_metrics_reader
+from cache import all_cache_stats
+from database import pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# (stats field, metric name, type) exported from pool_stats() / all_cache_stats()
+POOL_METRICS = (
+    ("checkedout", "db_pool_checked_out", "gauge"),
+    ("overflow", "db_pool_overflow", "gauge"),
+    ("size", "db_pool_size", "gauge"),
+    ("checkouts", "db_pool_checkouts_total", "counter"),
+    ("timeouts", "db_pool_timeouts_total", "counter"),
+    ("wait_seconds_total", "db_pool_wait_seconds_total", "counter"),
+)
+CACHE_METRICS = (
+    ("size", "cache_size", "gauge"),
+    ("hits", "cache_hits_total", "counter"),
+    ("misses", "cache_misses_total", "counter"),
+    ("evictions", "cache_evictions_total", "counter"),
+    ("invalidations", "cache_invalidations_total", "counter"),
+)
+
+# [statements, seconds] for the request being handled; shared with threadpool workers
+_request_sql: ContextVar = ContextVar("request_sql", default=None)
+
+
+# ================= PRIMITIVES =================
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": _fmt(bound)}, cumulative
+        yield f"{name}_bucket", {**labels, "le": "+Inf"}, self.count
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = {}          # (method, route, status) -> count
+        self.latency = {}           # (method, route) -> Histogram
+        self.statements = {}        # (method, route) -> Histogram of statements per request
+        self.sql_count = {}         # (method, route) -> total statements
+        self.sql_seconds = {}       # (method, route) -> total statement time
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method, route, status, seconds, sql_count, sql_seconds):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            status_key = (method, route, status)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+            latency = self.latency.get(key)
+            if latency is None:
+                latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.statements[key] = Histogram(STATEMENT_BUCKETS)
+            latency.observe(seconds)
+            self.statements[key].observe(sql_count)
+            self.sql_count[key] = self.sql_count.get(key, 0) + sql_count
+            self.sql_seconds[key] = self.sql_seconds.get(key, 0.0) + sql_seconds
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_labels(labels)} {_fmt(value)}")
+
+        def route_labels(key):
+            return {"method": key[0], "route": key[1]}
+
+        with self._lock:
+            family("http_requests_in_flight", "gauge", "Requests currently being handled.",
+                   [("http_requests_in_flight", {}, self.in_flight)])
+            family("http_requests_total", "counter", "Requests by route template and status.",
+                   [("http_requests_total",
+                     {"method": m, "route": r, "status": str(s)}, v)
+                    for (m, r, s), v in sorted(self.requests.items())])
+            family("http_request_duration_seconds", "histogram", "Request latency.",
+                   [sample for key, hist in sorted(self.latency.items())
+                    for sample in hist.samples("http_request_duration_seconds",
+                                               route_labels(key))])
+            family("db_statements_per_request", "histogram",
+                   "SQL statements executed per request.",
+                   [sample for key, hist in sorted(self.statements.items())
+                    for sample in hist.samples("db_statements_per_request",
+                                               route_labels(key))])
+            family("db_statements_total", "counter", "SQL statements executed.",
+                   [("db_statements_total", route_labels(k), v)
+                    for k, v in sorted(self.sql_count.items())])
+            family("db_statement_seconds_total", "counter", "Time spent in SQL statements.",
+                   [("db_statement_seconds_total", route_labels(k), v)
+                    for k, v in sorted(self.sql_seconds.items())])
+
+        pools = list(pool_stats().values())
+        for field, name, kind in POOL_METRICS:
+            family(name, kind, f"Connection pool {field}.",
+                   [(name, {"pool": p["name"]}, p[field]) for p in pools if field in p])
+
+        caches = all_cache_stats()
+        for field, name, kind in CACHE_METRICS:
+            family(name, kind, f"Cache {field}.",
+                   [(name, {"cache": c["name"]}, c[field]) for c in caches])
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else f"{value:.1f}"
+    return str(value)
+
+
+request_metrics = RequestMetrics()
+
+
+# ================= SQL HOOKS =================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    current = _request_sql.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += elapsed
+
+
+# ================= MIDDLEWARE =================
+
+def route_template(scope) -> str:
+    # routers mounted with include_router(prefix=...) match on their own routes,
+    # whose .path lacks the prefix; FastAPI records the full template alongside
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    route = scope.get("route")
+    return getattr(route, "path", "<unmatched>")
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware) so streaming responses pass
+    straight through; the route template is read from the scope after routing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        request_metrics.started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_metrics.finished(
+                scope["method"],
+                route_template(scope),
+                status,
+                time.perf_counter() - start,
+                sql[0],
+                sql[1],
+            )
+            _request_sql.reset(token)
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+# pool, cache and per-route series: admins or the METRICS_TOKEN scraper only
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(reader=Depends(get_metrics_reader)):
+    return PlainTextResponse(
+        request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,312 @@
+"""Schema migrations for databases that already hold data.
+
+At startup the app only creates missing tables (create_all), which never
+touches a table that exists. New columns and indexes on existing tables, and
+backfills, are migrations here. Run them once per deploy, from one machine,
+before the new code serves traffic:
+
+    python migrate.py status
+    python migrate.py upgrade
+
+Applied migrations are recorded in schema_migrations and every step is
+idempotent, so a run that was interrupted can simply be started again. A
+new, empty database is created whole and starts with the migrations
+recorded as applied, except those create_all cannot do there (the pg_trgm
+indexes on PostgreSQL).
+
+On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, which does
+not block writes to the table, so each statement runs in autocommit mode.
+An interrupted concurrent build leaves an INVALID index behind; it is
+dropped and built again on the next run.
+
+Privileges: the app role needs CREATE on the database for the pg_trgm
+extension (a trusted extension since PostgreSQL 13; on older servers a
+superuser has to run `CREATE EXTENSION pg_trgm` once), and ownership of the
+tables it indexes or alters.
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, Index, MetaData, String, Table, inspect, select, insert, text
+)
+from sqlalchemy.exc import IntegrityError, ProgrammingError
+from sqlalchemy.schema import CreateIndex
+
+from database import Base, engine, SessionLocal
+import models  # noqa: F401 -- registers the model tables on Base.metadata
+import points
+import rollup
+
+logger = logging.getLogger(__name__)
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("id", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# (id, description, function(conn)) in the order they are applied
+MIGRATIONS = []
+
+
+def migration(migration_id: str, description: str, fresh_dialects: tuple = ()):
+    """Register a migration. `fresh_dialects`: dialects on which a database
+    created from scratch by create_all still needs it (create_all does not
+    build what it makes there)."""
+    def register(fn):
+        fn.fresh_dialects = fresh_dialects
+        MIGRATIONS.append((migration_id, description, fn))
+        return fn
+    return register
+
+
+# ================= HELPERS =================
+
+def _model_table(name: str) -> Table:
+    # a private copy of the model table, so DDL options set by a migration
+    # never leak into create_all
+    return Base.metadata.tables[name].to_metadata(MetaData())
+
+
+def _drop_invalid_index(conn, name: str):
+    invalid = conn.scalar(text(
+        "SELECT NOT i.indisvalid FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name})
+    if invalid:
+        logger.warning("dropping invalid index %s left by an interrupted build", name)
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_index(conn, index):
+    """CREATE INDEX [CONCURRENTLY] IF NOT EXISTS for an index of a model table."""
+    if conn.dialect.name == "postgresql":
+        _drop_invalid_index(conn, index.name)
+        index.dialect_options["postgresql"]["concurrently"] = True
+    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def create_model_indexes(conn, table_name: str, *index_names: str):
+    table = _model_table(table_name)
+    by_name = {index.name: index for index in table.indexes}
+    for name in index_names:
+        create_index(conn, by_name[name])
+
+
+def add_column(conn, table_name: str, column_name: str):
+    """ADD COLUMN for a nullable model column (no table rewrite, no backfill)."""
+    if column_name in {c["name"] for c in inspect(conn).get_columns(table_name)}:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    assert column.nullable, f"{table_name}.{column_name} needs a backfill first"
+    conn.execute(text(
+        f"ALTER TABLE {table_name} ADD COLUMN {column_name} "
+        f"{column.type.compile(conn.dialect)}"
+    ))
+
+
+# ================= MIGRATIONS =================
+
+@migration("0001_transaction_indexes", "transaction listing / report indexes")
+def _transaction_indexes(conn):
+    create_model_indexes(
+        conn, "transactions",
+        "ix_transactions_account_date",
+        "ix_transactions_account_type_date",
+        "ix_transactions_category_date",
+    )
+
+
+@migration("0002_bill_indexes", "bill due-date and auto-pay queue indexes")
+def _bill_indexes(conn):
+    create_model_indexes(conn, "bills", "ix_bills_user_due", "ix_bills_autopay_due")
+
+
+@migration("0003_background_job_checkpoints", "background_jobs.rows_total / checkpoint")
+def _background_job_checkpoints(conn):
+    add_column(conn, "background_jobs", "rows_total")
+    add_column(conn, "background_jobs", "checkpoint")
+
+
+@migration("0004_transaction_search", "pg_trgm GIN indexes for /transactions/search",
+           fresh_dialects=("postgresql",))
+def _transaction_search(conn):
+    create_search_indexes(conn)
+
+
+def create_search_indexes(conn):
+    """Trigram indexes on merchant / description (Postgres only; SQLite
+    search scans the user's rows)."""
+    if conn.dialect.name != "postgresql":
+        return
+
+    installed = conn.scalar(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+    if not installed:
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except ProgrammingError as exc:
+            raise RuntimeError(
+                "cannot create the pg_trgm extension with this role; have a "
+                "superuser run `CREATE EXTENSION pg_trgm` in this database, "
+                "then run the migration again"
+            ) from exc
+
+    table = _model_table("transactions")
+    for column in ("merchant", "description"):
+        create_index(conn, Index(
+            f"ix_transactions_{column}_trgm", table.c[column],
+            postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+        ))
+
+
+@migration("0005_backfill_monthly_spend", "fill the monthly_spend rollup from transactions")
+def _backfill_monthly_spend(conn):
+    # dashboards, budgets, category-summary and analytics read only the
+    # rollup; replaced in one transaction of its own, so safe to re-run
+    db = SessionLocal()
+    try:
+        count = rollup.rebuild(db)
+    finally:
+        db.close()
+    logger.info("rebuilt %d rollup rows", count)
+
+
+@migration("0006_transaction_category_source", "transactions.category_source")
+def _transaction_category_source(conn):
+    # existing rows stay NULL (source unknown), see recategorize.py
+    add_column(conn, "transactions", "category_source")
+
+
+@migration("0007_one_active_recategorize_job", "one re-categorization job at a time")
+def _one_active_recategorize_job(conn):
+    create_model_indexes(conn, "background_jobs", "uq_background_jobs_active_recategorize")
+
+
+@migration("0008_background_job_heartbeat", "background_jobs.heartbeat_at")
+def _background_job_heartbeat(conn):
+    add_column(conn, "background_jobs", "heartbeat_at")
+
+
+@migration("0009_unique_reward_program", "one rewards row per user and program")
+def _unique_reward_program(conn):
+    # rows the old check-then-insert duplicated are merged first; balances
+    # are summed per user and program, so merging keeps the user's balance
+    db = SessionLocal()
+    try:
+        merged = points.merge_duplicate_rewards(db)
+        db.commit()
+    finally:
+        db.close()
+    logger.info("merged %d duplicate rewards rows", merged)
+    create_model_indexes(conn, "rewards", "uq_rewards_user_program")
+
+
+# ================= RUNNER =================
+
+def _connect():
+    # CONCURRENTLY cannot run inside a transaction block
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def applied(conn) -> set:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return set(conn.scalars(select(schema_migrations.c.id)))
+
+
+def pending() -> list:
+    with _connect() as conn:
+        done = applied(conn)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade() -> list:
+    """Apply every pending migration in order; returns the ids applied."""
+    ran = []
+    with _connect() as conn:
+        _meta.create_all(conn)
+        done = applied(conn)
+        for migration_id, description, fn in MIGRATIONS:
+            if migration_id in done:
+                continue
+            logger.info("applying %s: %s", migration_id, description)
+            fn(conn)
+            conn.execute(insert(schema_migrations),
+                         {"id": migration_id, "applied_at": datetime.utcnow()})
+            ran.append(migration_id)
+    return ran
+
+
+def create_schema() -> bool:
+    """create_all, as at app startup. A database without any of the model
+    tables gets them with every migration's columns and indexes already in
+    place, so those migrations are recorded as applied; returns True then."""
+    with engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+    fresh = not existing & set(Base.metadata.tables)
+
+    Base.metadata.create_all(engine)
+    if fresh:
+        _stamp_fresh()
+    return fresh
+
+
+def _stamp_fresh():
+    try:
+        with engine.begin() as conn:
+            _meta.create_all(conn)
+            done = applied(conn)
+            now = datetime.utcnow()
+            rows = [
+                {"id": migration_id, "applied_at": now}
+                for migration_id, _, fn in MIGRATIONS
+                if migration_id not in done
+                and conn.dialect.name not in fn.fresh_dialects
+            ]
+            if rows:
+                conn.execute(insert(schema_migrations), rows)
+    except IntegrityError:
+        # another worker started on the same empty database and stamped it
+        pass
+
+
+def warn_pending():
+    """Log migrations this code expects but the database has not had (startup)."""
+    missing = pending()
+    if missing:
+        logger.warning(
+            "%d schema migration(s) not applied (%s); run `python migrate.py upgrade`",
+            len(missing), ", ".join(m[0] for m in missing)
+        )
+    return missing
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schema migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # tables that do not exist yet are created whole, as the app does
+    create_schema()
+
+    if args.command == "status":
+        missing = {m[0] for m in pending()}
+        for migration_id, description, _ in MIGRATIONS:
+            state = "pending" if migration_id in missing else "applied"
+            print(f"{state:<8} {migration_id}  {description}")
+        return 1 if missing else 0
+
+    ran = upgrade()
+    print(f"applied {len(ran)} migration(s)" + (f": {', '.join(ran)}" if ran else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, Float,
-    ForeignKey, Numeric, DateTime,Date
+    ForeignKey, Numeric, DateTime,Date,
+    Index, UniqueConstraint, text
 )
 from sqlalchemy.orm import relationship
 from database import Base
@@ -43,6 +44,7 @@ class Account(Base):
         back_populates="account",
         cascade="all, delete"
     )
+    monthly_spend = relationship("MonthlySpend", cascade="all, delete")
 
 
 # =========================
@@ -50,6 +52,16 @@ class Account(Base):
 # =========================
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # per-account listing / keyset pages and date-range scans
+        Index("ix_transactions_account_date", "account_id", "txn_date", "id"),
+        # income vs expense over a period
+        Index("ix_transactions_account_type_date", "account_id", "txn_type", "txn_date"),
+        # category reports over a period
+        Index("ix_transactions_category_date", "category", "txn_date"),
+        # substring search (ILIKE '%q%') uses pg_trgm GIN indexes on Postgres;
+        # they need the extension, so only migrate.py creates them
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("accounts.id"))
@@ -57,6 +69,9 @@ class Transaction(Base):
     description = Column(String(255))
     merchant = Column(String(150))
     category = Column(String(100))
+    # who set the category: auto / manual / system (categorizer.SOURCE_*);
+    # NULL on rows written before it was recorded
+    category_source = Column(String(10), nullable=True)
     amount = Column(Numeric(12, 2))
     currency = Column(String(3))
     txn_type = Column(String(50))
@@ -65,6 +80,33 @@ class Transaction(Base):
     account = relationship("Account", back_populates="transactions")
 
 
+# =========================
+# MONTHLY SPEND ROLLUP
+# =========================
+# kept current by every transaction write, see rollup.py
+class MonthlySpend(Base):
+    __tablename__ = "monthly_spend"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "account_id", "year", "month", "category", "txn_type",
+            name="uq_monthly_spend_key"
+        ),
+        Index("ix_monthly_spend_user_period", "user_id", "year", "month"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
+
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category = Column(String(100), nullable=False, default="")  # "" = uncategorized
+    txn_type = Column(String(50), nullable=False)
+
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    txn_count = Column(Integer, nullable=False, default=0)
+
+
 # =========================
 # CATEGORY
 # =========================
@@ -99,6 +141,16 @@ class Budget(Base):
 # =========================
 class Bill(Base):
     __tablename__ = "bills"
+    __table_args__ = (
+        # a user's bills by due date; also the keyset order of /bills/due
+        Index("ix_bills_user_due", "user_id", "due_date", "id"),
+        # auto-pay queue: only auto_pay bills, oldest due first
+        Index(
+            "ix_bills_autopay_due", "due_date", "id",
+            postgresql_where=text("auto_pay"),
+            sqlite_where=text("auto_pay = 1"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -118,6 +170,10 @@ class Bill(Base):
 
 class Reward(Base):
     __tablename__ = "rewards"
+    __table_args__ = (
+        # one row per program; concurrent first requests insert ON CONFLICT DO NOTHING
+        Index("uq_rewards_user_program", "user_id", "program_name", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -126,4 +182,55 @@ class Reward(Base):
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     user = relationship("User")
-    
\ No newline at end of file
+
+
+# =========================
+# REWARD POINTS LEDGER
+# =========================
+# Append-only accruals: writers insert, never update, so concurrent debits
+# never contend on the Reward row. The balance is Reward.points_balance plus
+# the pending entries; compaction folds entries into it and deletes them.
+class RewardLedgerEntry(Base):
+    __tablename__ = "reward_ledger"
+    __table_args__ = (
+        Index("ix_reward_ledger_user", "user_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    points = Column(Integer, nullable=False)
+    reason = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# =========================
+# BACKGROUND JOB
+# =========================
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        # at most one re-categorization queued or running, across all workers
+        Index(
+            "uq_background_jobs_active_recategorize", "kind", unique=True,
+            postgresql_where=text("kind = 'recategorize' AND status IN ('queued', 'running')"),
+            sqlite_where=text("kind = 'recategorize' AND status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    # chunked jobs: rows expected, and the last primary key committed (resume point)
+    rows_total = Column(Integer, nullable=True)
+    checkpoint = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    # refreshed while a worker holds the job; a stale one means the worker died
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+from models import Transaction
+
+# ================= CONFIG =================
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# ================= CURSOR =================
+
+# a NULL sort value is encoded as an empty string
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    raw = f"{sort_value.isoformat() if sort_value is not None else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, parse=datetime.fromisoformat):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sort_value, row_id = raw.rsplit("|", 1)
+        return (parse(sort_value) if sort_value else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ================= KEYSET =================
+
+def keyset_order(query, after: str | None = None):
+    """Newest first over (txn_date, id); `after` resumes past the given cursor.
+
+    Rows without a txn_date come last, newest id first.
+    """
+    if after:
+        txn_date, txn_id = decode_cursor(after)
+        if txn_date is None:
+            query = query.filter(and_(
+                Transaction.txn_date.is_(None), Transaction.id < txn_id
+            ))
+        else:
+            query = query.filter(or_(
+                tuple_(Transaction.txn_date, Transaction.id) < tuple_(txn_date, txn_id),
+                Transaction.txn_date.is_(None)
+            ))
+
+    return query.order_by(
+        Transaction.txn_date.desc().nulls_last(), Transaction.id.desc()
+    )
+
+
+def next_cursor(rows, limit: int | None, sort_key: str = "txn_date"):
+    # no limit, or a short page, means there is nothing left to fetch
+    if limit is None or len(rows) < limit:
+        return None
+
+    last = rows[-1]
+    return encode_cursor(getattr(last, sort_key), last.id)
@@ -0,0 +1,201 @@
+"""Reward points on an append-only ledger.
+
+Accruals are plain INSERTs into reward_ledger, so parallel debits for one
+user never read-modify-write the shared Reward row. The balance is
+Reward.points_balance (compacted) plus the user's pending ledger entries.
+
+Compaction and redemption take pending entries with DELETE ... RETURNING --
+each entry is folded by exactly one transaction -- and then update the
+Reward row with a single atomic statement; redemption's update is
+conditional on the balance covering it.
+
+Functions take a sync Session; async routes call them through run_sync
+(accrue() only adds an object, so it works on either).
+
+    python points.py compact
+"""
+import argparse
+import sys
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal
+from models import Reward, RewardLedgerEntry
+
+PROGRAM = "Bank Rewards"
+COMPACT_BATCH = 1000
+
+
+def accrue(db, user_id: int, points: int, reason: str):
+    """Record earned points (no commit, no reads)."""
+    if points > 0:
+        db.add(RewardLedgerEntry(user_id=user_id, points=points, reason=reason))
+
+
+def _find_reward(db, user_id: int):
+    return db.scalar(select(Reward).where(
+        Reward.user_id == user_id,
+        Reward.program_name == PROGRAM
+    ))
+
+
+def get_or_create_reward(db, user_id: int) -> Reward:
+    reward = _find_reward(db, user_id)
+    if reward is not None:
+        return reward
+
+    # concurrent first requests may all get here; uq_rewards_user_program
+    # keeps one row and the others' inserts do nothing
+    values = {"user_id": user_id, "program_name": PROGRAM, "points_balance": 0}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Reward)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Reward)
+    else:
+        db.add(Reward(**values))
+        db.flush()
+        return _find_reward(db, user_id)
+
+    db.execute(stmt.values(values).on_conflict_do_nothing(
+        index_elements=["user_id", "program_name"]
+    ))
+    return _find_reward(db, user_id)
+
+
+def has_rewards(db, user_id: int) -> bool:
+    """A reward row or pending entries: anything that could be redeemed."""
+    reward = select(Reward.id).where(
+        Reward.user_id == user_id, Reward.program_name == PROGRAM
+    )
+    pending = select(RewardLedgerEntry.id).where(RewardLedgerEntry.user_id == user_id)
+    return bool(db.scalar(select(reward.exists() | pending.exists())))
+
+
+def merge_duplicate_rewards(db) -> int:
+    """Fold rows sharing (user_id, program_name) into the oldest (no commit);
+    returns the rows removed."""
+    groups = db.execute(
+        select(
+            Reward.user_id, Reward.program_name,
+            func.min(Reward.id), func.sum(Reward.points_balance), func.count()
+        )
+        .where(Reward.user_id.is_not(None))
+        .group_by(Reward.user_id, Reward.program_name)
+        .having(func.count() > 1)
+    ).all()
+
+    removed = 0
+    for user_id, program_name, keep_id, total, count in groups:
+        db.execute(
+            update(Reward).where(Reward.id == keep_id)
+            .values(points_balance=total)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(Reward)
+            .where(
+                Reward.user_id == user_id,
+                Reward.program_name == program_name,
+                Reward.id != keep_id
+            )
+            .execution_options(synchronize_session=False)
+        )
+        removed += count - 1
+    return removed
+
+
+def balance(db, user_id: int) -> int:
+    compacted = (
+        select(func.coalesce(func.sum(Reward.points_balance), 0))
+        .where(Reward.user_id == user_id, Reward.program_name == PROGRAM)
+        .scalar_subquery()
+    )
+    pending = (
+        select(func.coalesce(func.sum(RewardLedgerEntry.points), 0))
+        .where(RewardLedgerEntry.user_id == user_id)
+        .scalar_subquery()
+    )
+    return int(db.scalar(select(compacted + pending)))
+
+
+def _take_pending(db, user_id: int) -> int:
+    # rows deleted here are ours alone: a concurrent compaction blocks on them
+    # and then skips them, uncommitted accruals are left for the next fold
+    result = db.execute(
+        delete(RewardLedgerEntry)
+        .where(RewardLedgerEntry.user_id == user_id)
+        .returning(RewardLedgerEntry.points)
+    )
+    return sum(row[0] for row in result)
+
+
+def compact(db, user_id: int) -> int:
+    """Fold the user's pending entries into Reward.points_balance (no commit)."""
+    reward = get_or_create_reward(db, user_id)
+    folded = _take_pending(db, user_id)
+    if folded:
+        db.execute(
+            update(Reward)
+            .where(Reward.id == reward.id)
+            .values(points_balance=Reward.points_balance + folded)
+            .execution_options(synchronize_session=False)
+        )
+    return folded
+
+
+def redeem(db, user_id: int, points: int):
+    """Deduct `points` if the balance covers them; returns the remaining
+    balance, or None when it does not (no commit either way)."""
+    reward = get_or_create_reward(db, user_id)
+    compact(db, user_id)
+
+    remaining = db.scalar(
+        update(Reward)
+        .where(Reward.id == reward.id, Reward.points_balance >= points)
+        .values(points_balance=Reward.points_balance - points)
+        .returning(Reward.points_balance)
+        .execution_options(synchronize_session=False)
+    )
+    return remaining
+
+
+def set_balance(db, reward: Reward, points: int) -> Reward:
+    """Admin override: pin the balance, dropping pending entries (no commit)."""
+    if reward.program_name == PROGRAM:
+        _take_pending(db, reward.user_id)
+    reward.points_balance = points
+    return reward
+
+
+def compact_all(db, batch: int = COMPACT_BATCH) -> int:
+    """Compact every user with pending entries, committing every `batch` users."""
+    user_ids = db.scalars(select(RewardLedgerEntry.user_id).distinct()).all()
+    for i, user_id in enumerate(user_ids, 1):
+        compact(db, user_id)
+        if i % batch == 0:
+            db.commit()
+    db.commit()
+    return len(user_ids)
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reward points ledger")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--batch", type=int, default=COMPACT_BATCH)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        count = compact_all(db, args.batch)
+        print(f"compacted points for {count} users")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
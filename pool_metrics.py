@@ -0,0 +1,110 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+
+# ================= POOL METRICS =================
+
+class PoolMetrics:
+    """Counters fed by pool events; wait time comes from the instrumented pool class."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def bind(self, pool):
+        self.pool = pool
+        pool._metrics = self
+
+        @event.listens_for(pool, "connect")
+        def _connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def _checkout(dbapi_connection, connection_record, connection_proxy):
+            self.checkouts += 1
+
+        @event.listens_for(pool, "checkin")
+        def _checkin(dbapi_connection, connection_record):
+            self.checkins += 1
+
+        @event.listens_for(pool, "invalidate")
+        def _invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            data = {
+                "name": self.name,
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_avg": round(self.wait_seconds / self.waits, 6) if self.waits else 0.0,
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "timeouts": self.timeouts,
+            }
+        # QueuePool-style gauges; other pool classes (e.g. SQLite :memory:) lack them
+        for gauge in ("size", "checkedout", "overflow", "checkedin"):
+            method = getattr(pool, gauge, None)
+            if callable(method):
+                data[gauge] = method()
+        return data
+
+
+def instrumented(pool_class):
+    """Subclass of `pool_class` that times how long each checkout waits for
+    a connection (queue wait + connect) and reports it to its PoolMetrics."""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeout:
+                self._record_wait(time.perf_counter() - start, timed_out=True)
+                raise
+            self._record_wait(time.perf_counter() - start)
+            return connection
+
+        def _record_wait(self, seconds, timed_out=False):
+            metrics = getattr(self, "_metrics", None)
+            if metrics is not None:
+                metrics.record_wait(seconds, timed_out)
+
+        def recreate(self):
+            # engine.dispose() swaps in a fresh pool; event listeners carry over,
+            # the metrics object just needs to follow it
+            new_pool = super().recreate()
+            metrics = getattr(self, "_metrics", None)
+            if metrics is not None:
+                new_pool._metrics = metrics
+                metrics.pool = new_pool
+            return new_pool
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
@@ -0,0 +1,221 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from auth import get_admin_user
+from metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name, default="false"):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+# ================= SETTINGS =================
+# off by default; set from the environment at startup. PUT /diagnostics/queries
+# may change them at runtime only when QUERY_DIAGNOSTICS_RUNTIME_UPDATES is set
+# (EXPLAIN ANALYZE re-runs statements, so this is not a knob to leave open)
+
+class DiagnosticsSettings(BaseModel):
+    enabled: bool = _env_flag("QUERY_DIAGNOSTICS")
+    # fraction of requests whose statements are fingerprinted for N+1 detection
+    sample_rate: float = Field(float(os.getenv("QUERY_DIAGNOSTICS_SAMPLE_RATE", "0.1")), ge=0, le=1)
+    # flag a statement shape repeated more than this many times in one request
+    repeat_threshold: int = Field(int(os.getenv("QUERY_DIAGNOSTICS_REPEAT_THRESHOLD", "10")), ge=1)
+    slow_ms: float = Field(float(os.getenv("QUERY_DIAGNOSTICS_SLOW_MS", "200")), gt=0)
+    # EXPLAIN ANALYZE runs the statement again; only ever applied to SELECTs
+    explain_analyze: bool = _env_flag("QUERY_DIAGNOSTICS_EXPLAIN_ANALYZE")
+    # EXPLAIN a given statement shape at most once per interval
+    explain_interval_s: float = Field(float(os.getenv("QUERY_DIAGNOSTICS_EXPLAIN_INTERVAL", "60")), ge=0)
+
+
+class DiagnosticsUpdate(BaseModel):
+    enabled: bool | None = None
+    sample_rate: float | None = Field(None, ge=0, le=1)
+    repeat_threshold: int | None = Field(None, ge=1)
+    slow_ms: float | None = Field(None, gt=0)
+    explain_analyze: bool | None = None
+    explain_interval_s: float | None = Field(None, ge=0)
+
+
+settings = DiagnosticsSettings()
+RUNTIME_UPDATES = _env_flag("QUERY_DIAGNOSTICS_RUNTIME_UPDATES")
+
+# recent findings, newest last
+findings = deque(maxlen=200)
+_last_explained = {}
+_lock = threading.Lock()
+
+# Counter of statement fingerprints for a sampled request, else None
+_request_shapes: ContextVar = ContextVar("request_shapes", default=None)
+
+
+# ================= FINGERPRINTS =================
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|%s|\?")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_PLAIN_SELECT = re.compile(r"\s*select\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Statement shape: literals and bind markers become ?, IN-lists collapse."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PARAM_LIST.sub("(?+)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def _record(kind, **detail):
+    finding = {"kind": kind, "at": time.time(), **detail}
+    findings.append(finding)
+    logger.warning("%s %s", kind, detail)
+
+
+# ================= EXPLAIN =================
+
+def _explain_prefix(dialect_name, statement):
+    if dialect_name == "postgresql":
+        # plain SELECTs only: a WITH may wrap an INSERT / UPDATE / DELETE,
+        # which ANALYZE would run a second time
+        is_select = _PLAIN_SELECT.match(statement) is not None
+        if settings.explain_analyze and is_select:
+            return "EXPLAIN (ANALYZE, BUFFERS) "
+        return "EXPLAIN "
+    if dialect_name == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return "EXPLAIN "
+
+
+def _should_explain(shape) -> bool:
+    now = time.monotonic()
+    with _lock:
+        last = _last_explained.get(shape)
+        if last is not None and now - last < settings.explain_interval_s:
+            return False
+        _last_explained[shape] = now
+        return True
+
+
+def _explain(conn, statement, parameters):
+    # straight on the DBAPI connection: bypasses engine events (and the metrics
+    # counters) and reuses the driver's own paramstyle for the original statement
+    explain_cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        explain_cursor.execute(_explain_prefix(conn.dialect.name, statement) + statement, parameters)
+        return [" | ".join(str(col) for col in row) for row in explain_cursor.fetchall()]
+    except Exception as exc:
+        return [f"EXPLAIN failed: {exc!r}"]
+    finally:
+        explain_cursor.close()
+
+
+# ================= SQL HOOKS =================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if settings.enabled:
+        conn.info.setdefault("diagnostics_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("diagnostics_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1e3
+
+    shapes = _request_shapes.get()
+    if shapes is not None:
+        shapes[fingerprint(statement)] += 1
+
+    if elapsed_ms >= settings.slow_ms:
+        shape = fingerprint(statement)
+        plan = None
+        if not executemany and _should_explain(shape):
+            plan = _explain(conn, statement, parameters)
+        _record("slow_query", ms=round(elapsed_ms, 2), statement=shape, plan=plan)
+
+
+# ================= MIDDLEWARE =================
+
+class QueryDiagnosticsMiddleware:
+    """Fingerprints the statements of a sampled share of requests and reports
+    shapes repeated past the threshold (N+1 patterns)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not settings.enabled
+                or random.random() >= settings.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        shapes = Counter()
+        token = _request_shapes.set(shapes)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_shapes.reset(token)
+            repeated = {
+                shape: count for shape, count in shapes.items()
+                if count > settings.repeat_threshold
+            }
+            if repeated:
+                _record(
+                    "repeated_statement",
+                    method=scope["method"],
+                    route=route_template(scope),
+                    statements=sum(shapes.values()),
+                    repeated=repeated,
+                )
+
+
+# ================= ENDPOINTS =================
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+# findings carry statement shapes and plans: admins only (ADMIN_USER_IDS)
+
+
+@router.get("/queries")
+def get_query_diagnostics(current_user=Depends(get_admin_user)):
+    return {"settings": settings, "findings": list(findings)}
+
+
+@router.put("/queries")
+def update_query_diagnostics(
+    update: DiagnosticsUpdate,
+    current_user=Depends(get_admin_user)
+):
+    global settings
+    if not RUNTIME_UPDATES:
+        raise HTTPException(
+            status_code=403,
+            detail="Runtime changes are disabled; set QUERY_DIAGNOSTICS_RUNTIME_UPDATES"
+        )
+    settings = settings.model_copy(update=update.model_dump(exclude_none=True))
+    return settings
+
+
+@router.delete("/queries/findings")
+def clear_query_findings(current_user=Depends(get_admin_user)):
+    findings.clear()
+    return {"message": "Findings cleared"}
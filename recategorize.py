@@ -0,0 +1,220 @@
+"""Re-categorize historical transactions after category keywords change.
+
+Transactions are scanned in primary-key chunks with a plain SELECT (no
+locks) and run through the compiled keyword matcher. Each chunk then issues
+one UPDATE per (old category -> new category) pair, guarded on the old
+category so a concurrent manual change is never overwritten. The moved
+amounts go through the monthly rollup, and the chunk is committed together
+with the job's checkpoint. Row locks therefore last one short chunk
+transaction, and an interrupted job resumes after the last committed id.
+
+Only categories the matcher set are ever replaced (category_source
+"auto"): a user's own choice (PUT /transactions/{id}/category) and the
+categories the app assigns itself (Rewards, Bills) are left alone. Rows
+written before the source was recorded are treated as matcher output only
+when they are uncategorized or carry a category the matcher can produce.
+Rows that match no keyword keep whatever category they have.
+
+    python recategorize.py run [--chunk-size 2000] [--pause 0.05]
+    python recategorize.py resume JOB_ID
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import select, update, func, or_
+
+from database import SessionLocal
+from models import Account, Transaction, BackgroundJob
+from categorizer import get_category_matcher, SOURCE_AUTO
+from rollup import RollupDeltas, apply_rollup
+from cache import touch_user
+
+CHUNK_SIZE = 2000
+# seconds to sleep between chunks, leaving room for live traffic
+PAUSE = 0.0
+KIND = "recategorize"
+
+
+# ================= ONE CHUNK =================
+
+def _recategorizable(row, names) -> bool:
+    if row.category_source is None:
+        return row.category is None or row.category in names
+    return row.category_source == SOURCE_AUTO
+
+
+def recategorize_chunk(db, matcher, after_id: int, chunk_size: int = CHUNK_SIZE):
+    """Re-match the `chunk_size` transactions after `after_id` (no commit).
+
+    Returns (last id scanned or None when done, rows scanned, rows changed).
+    """
+    rows = db.execute(
+        select(
+            Transaction.id, Transaction.merchant, Transaction.description,
+            Transaction.category, Transaction.category_source,
+            Transaction.account_id, Transaction.txn_type,
+            Transaction.amount, Transaction.txn_date, Account.user_id
+        )
+        .join(Account, Account.id == Transaction.account_id)
+        .where(Transaction.id > after_id)
+        .order_by(Transaction.id)
+        .limit(chunk_size)
+    ).all()
+    if not rows:
+        return None, 0, 0
+
+    names = set(matcher.names)
+    moves = {}
+    for row in rows:
+        if not _recategorizable(row, names):
+            continue
+        category = matcher.categorize(row.merchant, row.description)
+        if category is not None and category != row.category:
+            moves.setdefault((row.category, category), []).append(row)
+
+    changed = 0
+    deltas = RollupDeltas()
+    users = set()
+    for (old, new), group in moves.items():
+        by_id = {row.id: row for row in group}
+        updated = db.execute(
+            update(Transaction)
+            .where(
+                Transaction.id.in_(by_id),
+                Transaction.category.is_not_distinct_from(old),
+                # a manual change since the SELECT wins
+                or_(Transaction.category_source.is_(None),
+                    Transaction.category_source == SOURCE_AUTO)
+            )
+            .values(category=new, category_source=SOURCE_AUTO)
+            .returning(Transaction.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        # only rows the guarded UPDATE actually changed move in the rollup
+        for txn_id in updated:
+            row = by_id[txn_id]
+            amount = float(row.amount or 0)
+            deltas.add(row.user_id, row.account_id, row.txn_date, old,
+                       row.txn_type, -amount, -1)
+            deltas.add(row.user_id, row.account_id, row.txn_date, new,
+                       row.txn_type, amount, 1)
+            users.add(row.user_id)
+        changed += len(updated)
+
+    apply_rollup(db, deltas)
+    for user_id in users:
+        touch_user(db, user_id)
+
+    return rows[-1].id, len(rows), changed
+
+
+# ================= JOB =================
+
+def run_job(job_id: str, chunk_size: int = CHUNK_SIZE, pause: float = PAUSE) -> int:
+    """Run (or resume) a re-categorization job; returns the rows changed."""
+    db = SessionLocal()
+    changed = 0
+    try:
+        job = db.get(BackgroundJob, job_id)
+        job.status = "running"
+        job.error = None
+        job.started_at = job.started_at or datetime.utcnow()
+        job.heartbeat_at = datetime.utcnow()
+        job.finished_at = None
+        if job.rows_total is None:
+            job.rows_total = db.scalar(select(func.count(Transaction.id)))
+        db.commit()
+
+        while True:
+            # rebuilt between chunks if the categories change mid-run
+            matcher = get_category_matcher(db)
+            last_id, scanned, chunk_changed = recategorize_chunk(
+                db, matcher, job.checkpoint or 0, chunk_size
+            )
+            if last_id is None:
+                break
+
+            job.checkpoint = last_id
+            job.rows_processed += scanned
+            db.commit()
+            changed += chunk_changed
+
+            if pause:
+                time.sleep(pause)
+
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        return changed
+
+    except Exception as exc:
+        # chunks committed so far stay committed; resume from the checkpoint
+        db.rollback()
+        job = db.get(BackgroundJob, job_id)
+        job.status = "failed"
+        job.error = str(exc)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        raise
+
+    finally:
+        db.close()
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    # the job record helpers live with the job pool
+    from jobs import create_job, job_status, active_job, fail_stale_jobs, hold, release
+
+    parser = argparse.ArgumentParser(description="Re-categorize transactions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="start a new job")
+    resume = sub.add_parser("resume", help="continue a job from its checkpoint")
+    resume.add_argument("job_id")
+    for p in (run, resume):
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        p.add_argument("--pause", type=float, default=PAUSE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        fail_stale_jobs(db)
+        active = active_job(db, KIND)
+        if active is not None and active.id != getattr(args, "job_id", None):
+            print(f"{KIND} job {active.id} is already {active.status}")
+            return 1
+        if args.command == "run":
+            job_id = create_job(db, None, KIND).id
+        else:
+            job = db.get(BackgroundJob, args.job_id)
+            if job is None or job.kind != KIND:
+                print(f"no {KIND} job {args.job_id}")
+                return 1
+            job_id = job.id
+    finally:
+        db.close()
+
+    print(f"job {job_id}")
+    # heartbeat, so app workers sweeping for dead jobs leave this one alone
+    hold(job_id)
+    try:
+        changed = run_job(job_id, args.chunk_size, args.pause)
+    finally:
+        release(job_id)
+
+    db = SessionLocal()
+    try:
+        status = job_status(db.get(BackgroundJob, job_id))
+    finally:
+        db.close()
+    print(f"scanned {status['rows_processed']} transactions, changed {changed}, "
+          f"{status['rows_per_second']:.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
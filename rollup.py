@@ -0,0 +1,241 @@
+"""Monthly spend rollup maintenance.
+
+Writers collect deltas in a RollupDeltas and call apply_rollup() inside the
+same DB transaction as the rows they describe. `python rollup.py rebuild` and
+`python rollup.py verify` recompute the table from `transactions`.
+
+Deploying onto a database that predates the rollup: `python migrate.py
+upgrade` backfills it (migration 0005) while the old code still serves.
+Once the new code is live, rebuild the months the old code wrote to in the
+meantime and check the result:
+
+    python rollup.py rebuild --since YYYY-MM
+    python rollup.py verify
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from sqlalchemy import func, extract, insert, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal
+from models import Account, Transaction, MonthlySpend
+
+ROLLUP_KEY = ("user_id", "account_id", "year", "month", "category", "txn_type")
+
+# drift below half a paisa is float noise, not a bug
+DRIFT_TOLERANCE = 0.005
+
+
+# ================= PERIODS =================
+
+def month_range(year: int, month: int):
+    """Half-open [start, end) bounds of a calendar month.
+
+    Filter with `txn_date >= start AND txn_date < end` rather than
+    extract(month/year) so the date indexes can be used.
+    """
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+# ================= DELTAS =================
+
+class RollupDeltas:
+    def __init__(self):
+        self.items = {}
+
+    def add(self, user_id, account_id, txn_date, category, txn_type,
+            amount, count: int = 1):
+        if txn_date is None:
+            return
+
+        key = (
+            user_id, account_id, txn_date.year, txn_date.month,
+            category or "", txn_type or ""
+        )
+        total, n = self.items.get(key, (0, 0))
+        self.items[key] = (total + float(amount), n + count)
+
+    def merge(self, other: "RollupDeltas"):
+        for key, (amount, count) in other.items.items():
+            total, n = self.items.get(key, (0, 0))
+            self.items[key] = (total + amount, n + count)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def apply_transaction(db, user_id, txn, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) one transaction from the rollup."""
+    deltas = RollupDeltas()
+    deltas.add(
+        user_id, txn.account_id, txn.txn_date, txn.category, txn.txn_type,
+        sign * float(txn.amount), sign
+    )
+    apply_rollup(db, deltas)
+
+
+def apply_rollup(db, deltas: RollupDeltas):
+    """Upsert deltas into monthly_spend (no commit)."""
+    if not deltas:
+        return
+
+    # key order, so concurrent writers with overlapping keys cannot deadlock
+    rows = [
+        dict(zip(ROLLUP_KEY, key), total=round(amount, 2), txn_count=count)
+        for key, (amount, count) in sorted(deltas.items.items())
+    ]
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(MonthlySpend)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(MonthlySpend)
+    else:
+        _apply_portable(db, rows)
+        return
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            "total": MonthlySpend.total + stmt.excluded.total,
+            "txn_count": MonthlySpend.txn_count + stmt.excluded.txn_count,
+        }
+    )
+    db.execute(stmt, rows)
+
+
+def _apply_portable(db, rows):
+    for row in rows:
+        existing = db.query(MonthlySpend).filter_by(
+            **{k: row[k] for k in ROLLUP_KEY}
+        ).with_for_update().first()
+
+        if existing:
+            existing.total = MonthlySpend.total + row["total"]
+            existing.txn_count = MonthlySpend.txn_count + row["txn_count"]
+        else:
+            db.add(MonthlySpend(**row))
+
+
+# ================= REBUILD / VERIFY =================
+
+def _aggregate_from_transactions(db, user_id=None, since=None):
+    year = extract("year", Transaction.txn_date)
+    month = extract("month", Transaction.txn_date)
+    category = func.coalesce(Transaction.category, "")
+    txn_type = func.coalesce(Transaction.txn_type, "")
+
+    query = (
+        db.query(
+            Account.user_id, Transaction.account_id, year, month,
+            category, txn_type,
+            func.sum(Transaction.amount), func.count(Transaction.id)
+        )
+        .join(Account)
+        .filter(Transaction.txn_date.isnot(None))
+        .group_by(Account.user_id, Transaction.account_id, year, month,
+                  category, txn_type)
+    )
+    if user_id is not None:
+        query = query.filter(Account.user_id == user_id)
+    if since is not None:
+        query = query.filter(Transaction.txn_date >= month_range(*since)[0])
+
+    return {
+        (row[0], row[1], int(row[2]), int(row[3]), row[4], row[5]):
+            (float(row[6] or 0), row[7])
+        for row in query
+    }
+
+
+def _stored_rows(db, user_id=None, since=None):
+    query = db.query(MonthlySpend)
+    if user_id is not None:
+        query = query.filter(MonthlySpend.user_id == user_id)
+    if since is not None:
+        query = query.filter(tuple_(MonthlySpend.year, MonthlySpend.month) >= since)
+    return query
+
+
+def rebuild(db, user_id=None, since=None) -> int:
+    """Replace the rollup (for one user or everyone, optionally only from the
+    (year, month) `since` onwards) with fresh totals."""
+    fresh = _aggregate_from_transactions(db, user_id, since)
+
+    _stored_rows(db, user_id, since).delete(synchronize_session=False)
+
+    if fresh:
+        db.execute(insert(MonthlySpend), [
+            dict(zip(ROLLUP_KEY, key), total=round(amount, 2), txn_count=count)
+            for key, (amount, count) in fresh.items()
+        ])
+
+    db.commit()
+    return len(fresh)
+
+
+def verify(db, user_id=None, since=None) -> list:
+    """Return (key, expected, stored) for every rollup row that has drifted."""
+    fresh = _aggregate_from_transactions(db, user_id, since)
+
+    stored = {}
+    for row in _stored_rows(db, user_id, since):
+        if row.txn_count or row.total:
+            key = tuple(getattr(row, col) for col in ROLLUP_KEY)
+            stored[key] = (float(row.total), row.txn_count)
+
+    drift = []
+    for key in fresh.keys() | stored.keys():
+        expected = fresh.get(key, (0.0, 0))
+        actual = stored.get(key, (0.0, 0))
+        if (abs(expected[0] - actual[0]) > DRIFT_TOLERANCE
+                or expected[1] != actual[1]):
+            drift.append((key, expected, actual))
+
+    return sorted(drift)
+
+
+# ================= CLI =================
+
+def _year_month(value: str):
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected YYYY-MM")
+    return parsed.year, parsed.month
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly spend rollup")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--since", type=_year_month, default=None,
+                        help="only months from YYYY-MM onwards")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            count = rebuild(db, args.user_id, args.since)
+            print(f"rebuilt {count} rollup rows")
+            return 0
+
+        drift = verify(db, args.user_id, args.since)
+        for key, expected, actual in drift:
+            print(f"DRIFT {dict(zip(ROLLUP_KEY, key))} "
+                  f"expected={expected} stored={actual}")
+        print(f"{len(drift)} drifted rollup rows")
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User, Account
 from database import get_db
 from auth import get_current_user
 from schemas import AccountCreate, AccountResponse
+from cache import touch_user
+from fast_json import ORJSONResponse, rows_to_dicts
 
 router = APIRouter(tags=["Accounts"])
 
 @router.get("/", response_model=list[AccountResponse])
-def get_accounts(
-    db: Session = Depends(get_db),
+async def get_accounts(
+    db: AsyncSession = Depends(get_db),
     current_user:User = Depends(get_current_user)
 ):
-    return db.query(Account).filter(
-        Account.user_id == current_user.id
-    ).all()
+    result = await db.execute(
+        select(Account.id, Account.bank_name, Account.account_type, Account.balance)
+        .where(Account.user_id == current_user.id)
+    )
+    return ORJSONResponse(rows_to_dicts(result.all()))
 
 
 @router.post("/",)
-def create_account(
+async def create_account(
     account: AccountCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     if not current_user:
@@ -34,24 +39,26 @@ def create_account(
         user_id=current_user.id
     )
     db.add(new_account)
-    db.commit()
-    db.refresh(new_account)
+    touch_user(db, current_user.id)
+    await db.commit()
+    await db.refresh(new_account)
     return new_account
 
 @router.delete("/{account_id}")
-def delete_account(
+async def delete_account(
     account_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    account = db.query(Account).filter(
+    account = await db.scalar(select(Account).where(
         Account.id == account_id,
         Account.user_id == current_user.id
-    ).first()
+    ))
 
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    db.delete(account)
-    db.commit()
-    return {"message": "Account deleted"}
\ No newline at end of file
+    await db.delete(account)
+    touch_user(db, current_user.id)
+    await db.commit()
+    return {"message": "Account deleted"}
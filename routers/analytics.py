@@ -0,0 +1,251 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func, tuple_, cast, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from auth import get_current_user
+from models import User, Account, Transaction, MonthlySpend
+from schemas import Granularity
+from fast_json import ORJSONResponse
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+# ================= CONFIG =================
+
+TXN_TYPES = {"credit": "income", "debit": "expense"}
+PERCENTILES = (25, 50, 75, 90)
+
+DEFAULT_SPAN_DAYS = {Granularity.day: 90, Granularity.week: 364, Granularity.month: 365}
+DEFAULT_WINDOW = {Granularity.day: 7, Granularity.week: 4, Granularity.month: 3}
+MAX_PERIODS = {Granularity.day: 3660, Granularity.week: 530, Granularity.month: 120}
+
+
+# =====================================================
+# PERIODS
+# =====================================================
+def period_bounds(granularity: Granularity, from_date: date, to_date: date):
+    """First period start (aligned down) and the number of periods."""
+    if granularity is Granularity.day:
+        start = from_date
+        count = (to_date - start).days + 1
+    elif granularity is Granularity.week:
+        # ISO weeks, like date_trunc('week'): Monday first
+        start = from_date - timedelta(days=from_date.weekday())
+        count = (to_date - start).days // 7 + 1
+    else:
+        start = from_date.replace(day=1)
+        count = (to_date.year - start.year) * 12 + to_date.month - start.month + 1
+    return start, count
+
+
+def _period_expr(granularity: Granularity, dialect: str):
+    if dialect == "sqlite":
+        if granularity is Granularity.week:
+            return func.date(Transaction.txn_date, "weekday 0", "-6 days")
+        return func.date(Transaction.txn_date)
+    return func.date_trunc(granularity.value, Transaction.txn_date)
+
+
+def series_query(user_id: int, granularity: Granularity, start: date, to_date: date,
+                 dialect: str):
+    """(period, category, txn_type, total) rows, summed in the database."""
+    types = list(TXN_TYPES)
+
+    # whole months are already summed in the rollup
+    if granularity is Granularity.month:
+        return (
+            select(
+                (MonthlySpend.year * 12 + MonthlySpend.month - 1).label("period"),
+                MonthlySpend.category,
+                MonthlySpend.txn_type,
+                cast(func.sum(MonthlySpend.total), Float).label("total"),
+            )
+            .where(
+                MonthlySpend.user_id == user_id,
+                MonthlySpend.txn_type.in_(types),
+                tuple_(MonthlySpend.year, MonthlySpend.month) >= (start.year, start.month),
+                tuple_(MonthlySpend.year, MonthlySpend.month) <= (to_date.year, to_date.month),
+            )
+            .group_by(MonthlySpend.year, MonthlySpend.month,
+                      MonthlySpend.category, MonthlySpend.txn_type)
+        )
+
+    period = _period_expr(granularity, dialect).label("period")
+    return (
+        select(
+            period,
+            Transaction.category,
+            Transaction.txn_type,
+            cast(func.sum(Transaction.amount), Float).label("total"),
+        )
+        .join(Account, Account.id == Transaction.account_id)
+        .where(
+            Account.user_id == user_id,
+            Transaction.txn_type.in_(types),
+            Transaction.txn_date >= datetime.combine(start, time.min),
+            Transaction.txn_date < datetime.combine(to_date + timedelta(days=1), time.min),
+        )
+        .group_by(period, Transaction.category, Transaction.txn_type)
+    )
+
+
+# =====================================================
+# VECTORIZED SERIES STATISTICS
+# =====================================================
+# everything below works on whole (series x periods) arrays at once; the
+# only Python loops are over series when building the response
+
+def _period_index(granularity: Granularity, periods, start: date):
+    if granularity is Granularity.month:
+        return np.asarray(periods, dtype=np.int64) - (start.year * 12 + start.month - 1)
+
+    days = (np.array(periods, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+    return days // 7 if granularity is Granularity.week else days
+
+
+def _period_starts(granularity: Granularity, start: date, count: int):
+    if granularity is Granularity.month:
+        return np.datetime64(start, "M") + np.arange(count)
+    step = 7 if granularity is Granularity.week else 1
+    return np.datetime64(start, "D") + np.arange(count) * step
+
+
+def series_stats(totals, window: int, month_index, month_count: int) -> dict:
+    """Statistics along the period axis of a (series, periods) array."""
+    rows, count = totals.shape
+    idx = np.arange(count)
+
+    # rolling mean from a prefix sum; the first periods average what exists
+    csum = np.zeros((rows, count + 1))
+    np.cumsum(totals, axis=1, out=csum[:, 1:])
+    lo = np.maximum(idx + 1 - window, 0)
+    rolling = (csum[:, idx + 1] - csum[:, lo]) / (idx + 1 - lo)
+
+    delta = np.full((rows, count), np.nan)
+    delta[:, 1:] = np.diff(totals, axis=1)
+
+    # month-over-month on calendar months, whatever the granularity
+    monthly = np.zeros((month_count, rows))
+    np.add.at(monthly, month_index, totals.T)
+    mom = np.full((rows, month_count), np.nan)
+    mom[:, 1:] = np.diff(monthly.T, axis=1)
+
+    return {
+        "total": totals.sum(axis=1),
+        "mean": totals.mean(axis=1),
+        "totals": totals,
+        "rolling_avg": rolling,
+        "delta": delta,
+        "mom_delta": mom,
+        "percentiles": np.percentile(totals, PERCENTILES, axis=1).T,
+    }
+
+
+def _rounded(stats: dict) -> dict:
+    # one round + tolist per statistic, not per series
+    return {key: np.round(value, 2).tolist() for key, value in stats.items()}
+
+
+def _series_json(stats: dict, i: int) -> dict:
+    # NaN (no previous period) is encoded as null by orjson
+    return {
+        "total": stats["total"][i],
+        "mean": stats["mean"][i],
+        "totals": stats["totals"][i],
+        "rolling_avg": stats["rolling_avg"][i],
+        "delta": stats["delta"][i],
+        "mom_delta": stats["mom_delta"][i],
+        "percentiles": {f"p{p}": v for p, v in zip(PERCENTILES, stats["percentiles"][i])},
+    }
+
+
+def build_series(rows, granularity: Granularity, start: date, count: int,
+                 window: int) -> dict:
+    """Dense income / expense series per category from aggregated SQL rows."""
+    periods = _period_starts(granularity, start, count)
+    months = np.unique(periods.astype("datetime64[M]"))
+    month_index = (periods.astype("datetime64[M]") - months[0]).astype(np.int64)
+
+    if rows:
+        period_values, categories, txn_types, amounts = zip(*rows)
+        # "" = uncategorized, as in the rollup
+        names = sorted({c or "" for c in categories})
+        position = {name: i for i, name in enumerate(names)}
+        cat_index = np.fromiter((position[c or ""] for c in categories), np.int64, len(rows))
+        type_index = np.fromiter((t == "debit" for t in txn_types), np.int64, len(rows))
+        period_index = _period_index(granularity, period_values, start)
+        values = np.fromiter(amounts, np.float64, len(rows))
+    else:
+        names = []
+        cat_index = type_index = period_index = np.array([], dtype=np.int64)
+        values = np.array([], dtype=np.float64)
+
+    # (income/expense, category, period)
+    matrix = np.zeros((2, len(names), count))
+    np.add.at(matrix, (type_index, cat_index, period_index), values)
+
+    per_category = _rounded(
+        series_stats(matrix.reshape(-1, count), window, month_index, len(months)))
+    overall = _rounded(series_stats(matrix.sum(axis=1), window, month_index, len(months)))
+
+    kinds = list(TXN_TYPES.values())
+    series = []
+    for t, kind in enumerate(kinds):
+        for c, name in enumerate(names):
+            i = t * len(names) + c
+            # categories with no activity of this kind in the window are dropped
+            if not matrix[t, c].any():
+                continue
+            series.append({"category": name or None, "type": kind,
+                           **_series_json(per_category, i)})
+
+    return {
+        "granularity": granularity.value,
+        "window": window,
+        "periods": np.datetime_as_string(periods).tolist(),
+        "months": np.datetime_as_string(months).tolist(),
+        "income": _series_json(overall, 0),
+        "expense": _series_json(overall, 1),
+        "series": series,
+    }
+
+
+# =====================================================
+# SPENDING SERIES
+# =====================================================
+@router.get("/spending-series")
+async def get_spending_series(
+    granularity: Granularity = Query(Granularity.month),
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    window: int | None = Query(None, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=DEFAULT_SPAN_DAYS[granularity])
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    start, count = period_bounds(granularity, from_date, to_date)
+    if count > MAX_PERIODS[granularity]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PERIODS[granularity]} {granularity.value} periods per request"
+        )
+
+    dialect = db.get_bind().dialect.name
+    rows = (await db.execute(
+        series_query(current_user.id, granularity, start, to_date, dialect)
+    )).all()
+
+    result = build_series(rows, granularity, start, count, window or DEFAULT_WINDOW[granularity])
+    result["from"] = from_date.isoformat()
+    result["to"] = to_date.isoformat()
+    return ORJSONResponse(result)
@@ -1,39 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, case, and_, func, cast, type_coerce, tuple_, Boolean, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, timedelta
 
 from database import get_db
 from models import Bill
 from schemas import BillCreate, BillUpdate, BillResponse, BillStatus
 from auth import get_current_user
+from fast_json import ORJSONResponse, rows_to_dicts
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+)
 
 router = APIRouter(
     prefix="/bills",
     tags=["Bills"]
 )
 
+DEFAULT_DUE_WINDOW_DAYS = 30
+
 # =========================
-# HELPER FUNCTIONS (ADDED)
+# STATUS / OVERDUE IN SQL
 # =========================
-def calculate_overdue(due_date, status):
-    return status != BillStatus.paid and date.today() > due_date
+def _bill_columns(today: date):
+    # today is bound from the app, as the Python-side check used to do
+    is_paid = func.coalesce(Bill.status, "") == BillStatus.paid.value
+    is_overdue = and_(~is_paid, Bill.due_date < today)
+
+    status = case(
+        (is_paid, BillStatus.paid.value),
+        (is_overdue, BillStatus.overdue.value),
+        else_=BillStatus.upcoming.value,
+    )
+
+    return (
+        Bill.id,
+        Bill.user_id,
+        Bill.biller_name,
+        cast(Bill.amount_due, Float).label("amount_due"),
+        Bill.due_date,
+        status.label("status"),
+        Bill.auto_pay,
+        type_coerce(is_overdue, Boolean).label("overdue"),
+        Bill.created_at,
+    ), status
 
 
-def calculate_status(due_date, status):
-    if status == BillStatus.paid:
-        return BillStatus.paid
-    if date.today() > due_date:
-        return BillStatus.overdue
-    return BillStatus.upcoming
+async def _bill_response(db, bill_id):
+    columns, _ = _bill_columns(date.today())
+    row = (await db.execute(select(*columns).where(Bill.id == bill_id))).one()
+    return dict(row._mapping)
 
 
 # =========================
 # CREATE BILL
 # =========================
 @router.post("/", response_model=BillResponse)
-def create_bill(
+async def create_bill(
     bill: BillCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     new_bill = Bill(
@@ -46,53 +71,87 @@ def create_bill(
     )
 
     db.add(new_bill)
-    db.commit()
-    db.refresh(new_bill)
+    await db.commit()
 
-    return {
-        **new_bill.__dict__,
-        "status": calculate_status(new_bill.due_date, new_bill.status),
-        "overdue": calculate_overdue(new_bill.due_date, new_bill.status)
-    }
+    return await _bill_response(db, new_bill.id)
 
 
 # =========================
 # LIST ALL BILLS
 # =========================
 @router.get("/", response_model=list[BillResponse])
-def list_bills(
-    db: Session = Depends(get_db),
+async def list_bills(
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    bills = db.query(Bill).filter(
-        Bill.user_id == current_user.id
-    ).all()
+    columns, _ = _bill_columns(date.today())
+    result = await db.execute(
+        select(*columns)
+        .where(Bill.user_id == current_user.id)
+        .order_by(Bill.due_date, Bill.id)
+    )
+
+    return ORJSONResponse(rows_to_dicts(result.all()))
+
+
+# =========================
+# BILLS DUE IN A DATE WINDOW
+# =========================
+@router.get("/due", response_model=list[BillResponse])
+async def list_bills_due(
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    status: BillStatus | None = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    # defaults to the coming month; the window is inclusive on both ends
+    today = date.today()
+    from_date = from_date or today
+    to_date = to_date or from_date + timedelta(days=DEFAULT_DUE_WINDOW_DAYS)
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    columns, status_expr = _bill_columns(today)
+    query = select(*columns).where(
+        Bill.user_id == current_user.id,
+        Bill.due_date >= from_date,
+        Bill.due_date <= to_date,
+    )
+    if status is not None:
+        query = query.where(status_expr == status.value)
+    if after:
+        due_date, bill_id = decode_cursor(after, parse=date.fromisoformat)
+        query = query.where(tuple_(Bill.due_date, Bill.id) > tuple_(due_date, bill_id))
+
+    rows = (await db.execute(
+        query.order_by(Bill.due_date, Bill.id).limit(limit)
+    )).all()
 
-    response = []
-    for bill in bills:
-        response.append({
-            **bill.__dict__,
-            "status": calculate_status(bill.due_date, bill.status),
-            "overdue": calculate_overdue(bill.due_date, bill.status)
-        })
+    headers = {}
+    cursor = next_cursor(rows, limit, sort_key="due_date")
+    if cursor:
+        headers[NEXT_CURSOR_HEADER] = cursor
 
-    return response
+    return ORJSONResponse(rows_to_dicts(rows), headers=headers)
 
 
 # =========================
 # UPDATE BILL (MARK PAID / EDIT)
 # =========================
 @router.put("/{bill_id}", response_model=BillResponse)
-def update_bill(
+async def update_bill(
     bill_id: int,
     bill_data: BillUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    bill = db.query(Bill).filter(
+    bill = await db.scalar(select(Bill).where(
         Bill.id == bill_id,
         Bill.user_id == current_user.id
-    ).first()
+    ))
 
     if not bill:
         raise HTTPException(status_code=404, detail="Bill not found")
@@ -113,34 +172,29 @@ def update_bill(
     if bill_data.auto_pay is not None:
         bill.auto_pay = bill_data.auto_pay
 
-    db.commit()
-    db.refresh(bill)
+    await db.commit()
 
-    return {
-        **bill.__dict__,
-        "status": calculate_status(bill.due_date, bill.status),
-        "overdue": calculate_overdue(bill.due_date, bill.status)
-    }
+    return await _bill_response(db, bill.id)
 
 
 # =========================
 # DELETE BILL
 # =========================
 @router.delete("/{bill_id}")
-def delete_bill(
+async def delete_bill(
     bill_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    bill = db.query(Bill).filter(
+    bill = await db.scalar(select(Bill).where(
         Bill.id == bill_id,
         Bill.user_id == current_user.id
-    ).first()
+    ))
 
     if not bill:
         raise HTTPException(status_code=404, detail="Bill not found")
 
-    db.delete(bill)
-    db.commit()
+    await db.delete(bill)
+    await db.commit()
 
     return {"message": "Bill deleted successfully"}
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 
 from database import get_db
-from models import Budget, Transaction
+from models import Budget, MonthlySpend
 from schemas import BudgetCreate, BudgetResponse
+from fast_json import ORJSONResponse
 
 # ✅ FIXED IMPORT
 from auth import get_current_user
@@ -18,9 +19,9 @@ router = APIRouter(
 # A) CREATE BUDGET
 # =================================================
 @router.post("/", response_model=BudgetResponse)
-def create_budget(
+async def create_budget(
     budget: BudgetCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     new_budget = Budget(
@@ -32,72 +33,116 @@ def create_budget(
     )
 
     db.add(new_budget)
-    db.commit()
-    db.refresh(new_budget)
+    await db.commit()
 
-    return new_budget
+    # spent from the rollup, as in list / progress (not the stored column)
+    return await _budget_with_spent(db, current_user.id, new_budget.id)
+
+
+# =================================================
+# SPENT PER BUDGET (ONE STATEMENT, NO WRITES)
+# =================================================
+async def _budgets_with_spent(db, user_id, month=None, year=None, budget_id=None):
+    # correlated lookup per budget row -> index probe on the user's rollup
+    spent = (
+        select(func.coalesce(func.sum(MonthlySpend.total), 0))
+        .where(
+            MonthlySpend.user_id == user_id,
+            MonthlySpend.txn_type == "debit",
+            MonthlySpend.year == Budget.year,
+            MonthlySpend.month == Budget.month,
+            MonthlySpend.category == Budget.category,
+        )
+        .scalar_subquery()
+    )
+
+    query = select(Budget, spent.label("spent")).where(
+        Budget.user_id == user_id
+    )
+    if month is not None:
+        query = query.where(Budget.month == month)
+    if year is not None:
+        query = query.where(Budget.year == year)
+    if budget_id is not None:
+        query = query.where(Budget.id == budget_id)
+
+    result = await db.execute(query.order_by(Budget.year, Budget.month, Budget.id))
+    return result.all()
+
+
+def _budget_response(budget, spent, warning=None):
+    return {
+        "id": budget.id,
+        "month": budget.month,
+        "year": budget.year,
+        "category": budget.category,
+        "limit_amount": budget.limit_amount,
+        "spent_amount": float(spent),
+        "warning": warning,
+    }
+
+
+async def _budget_with_spent(db, user_id, budget_id):
+    [(budget, spent)] = await _budgets_with_spent(db, user_id, budget_id=budget_id)
+    return _budget_response(budget, spent)
 
 
 # =================================================
 # B) LIST BUDGETS
 # =================================================
 @router.get("/", response_model=list[BudgetResponse])
-def list_budgets(
-    db: Session = Depends(get_db),
+async def list_budgets(
+    month: int | None = Query(None, ge=1, le=12),
+    year: int | None = Query(None),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    return db.query(Budget).filter(
-        Budget.user_id == current_user.id
-    ).all()
+    return ORJSONResponse([
+        _budget_response(budget, spent)
+        for budget, spent in await _budgets_with_spent(db, current_user.id, month, year)
+    ])
 
 
 @router.get("/progress", response_model=list[BudgetResponse])
-def budget_progress(
-    db: Session = Depends(get_db),
+async def budget_progress(
+    month: int | None = Query(None, ge=1, le=12),
+    year: int | None = Query(None),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    budgets = db.query(Budget).filter(
-        Budget.user_id == current_user.id
-    ).all()
-
-    for b in budgets:
-        
-        spent = db.query(func.sum(Transaction.amount)).filter(
-            Transaction.category == b.category,
-            Transaction.txn_type == "debit",
-            extract("month", Transaction.txn_date) == b.month,
-            extract("year", Transaction.txn_date) == b.year).scalar() or 0
-
-        b.spent_amount = spent
+    response = []
 
+    for budget, spent in await _budgets_with_spent(db, current_user.id, month, year):
+        spent = float(spent)
 
         # 🔥 WARNING LOGIC
-        if spent > b.limit_amount:
-            b.warning = "⚠️ Budget limit exceeded"
+        if spent > budget.limit_amount:
+            warning = "⚠️ Budget limit exceeded"
         else:
-            b.warning = "Within limit"
+            warning = "Within limit"
+
+        response.append(_budget_response(budget, spent, warning))
 
-    db.commit()
-    return budgets
+    return ORJSONResponse(response)
 # =================================================
 # DELETE BUDGET
 # =================================================
 @router.delete("/{budget_id}")
-def delete_budget(
+async def delete_budget(
     budget_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    budget = db.query(Budget).filter(
+    budget = await db.scalar(select(Budget).where(
         Budget.id == budget_id,
         Budget.user_id == current_user.id
-    ).first()
+    ))
 
     if not budget:
         return {"error": "Budget not found"}
 
-    db.delete(budget)
-    db.commit()
+    await db.delete(budget)
+    await db.commit()
 
     return {"message": "Budget deleted successfully"}
 
@@ -105,16 +150,16 @@ def delete_budget(
 # D) UPDATE BUDGET
 # =================================================
 @router.put("/{budget_id}", response_model=BudgetResponse)
-def update_budget(
+async def update_budget(
     budget_id: int,
     budget: BudgetCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    existing = db.query(Budget).filter(
+    existing = await db.scalar(select(Budget).where(
         Budget.id == budget_id,
         Budget.user_id == current_user.id
-    ).first()
+    ))
 
     if not existing:
         raise HTTPException(status_code=404, detail="Budget not found")
@@ -125,7 +170,6 @@ def update_budget(
     existing.category = budget.category
     existing.limit_amount = budget.limit_amount
 
-    db.commit()
-    db.refresh(existing)
+    await db.commit()
 
-    return existing
+    return await _budget_with_spent(db, current_user.id, existing.id)
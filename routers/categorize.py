@@ -1,11 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from database import get_db
-from auth import get_current_user
-from models import Category, User
-from schemas import CategoryCreate, CategoryResponse
+from database import get_db, get_sync_db
+from auth import get_current_user, get_admin_user
+from models import Category, User, BackgroundJob
+from schemas import CategoryCreate, CategoryResponse, JobResponse
+from jobs import (
+    submit_recategorize_job, resume_recategorize_job, job_status,
+    is_stale, fail_stale_jobs
+)
+from recategorize import KIND as RECATEGORIZE_KIND
+from categorizer import get_category_matcher_async, invalidate_category_matcher
 
 router = APIRouter(
     prefix="/categories",
@@ -14,22 +22,22 @@ router = APIRouter(
 
 # 🔹 GET ALL CATEGORIES
 @router.get("/", response_model=List[CategoryResponse])
-def get_categories(
-    db: Session = Depends(get_db),
+async def get_categories(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Category).all()
+    return (await db.scalars(select(Category))).all()
 
 
 
 # 🔹 CREATE NEW CATEGORY (WITH KEYWORDS)
 @router.post("/", response_model=CategoryResponse)
-def create_category(
+async def create_category(
     data: CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    existing = db.query(Category).filter(Category.name == data.name).first()
+    existing = await db.scalar(select(Category).where(Category.name == data.name))
     if existing:
         raise HTTPException(status_code=400, detail="Category already exists")
 
@@ -39,21 +47,22 @@ def create_category(
     )
 
     db.add(cat)
-    db.commit()
-    db.refresh(cat)
+    await db.commit()
+    invalidate_category_matcher()
+    await db.refresh(cat)
 
     return cat
 
 
 # 🔹 UPDATE CATEGORY KEYWORDS
 @router.put("/{cat_id}", response_model=CategoryResponse)
-def update_category(
+async def update_category(
     cat_id: int,
     data: CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    cat = db.query(Category).filter(Category.id == cat_id).first()
+    cat = await db.scalar(select(Category).where(Category.id == cat_id))
 
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -61,46 +70,97 @@ def update_category(
     cat.name = data.name
     cat.keywords = data.keywords
 
-    db.commit()
-    db.refresh(cat)
+    await db.commit()
+    invalidate_category_matcher()
+    await db.refresh(cat)
 
     return cat
 
 
 # 🔹 DELETE CATEGORY (OPTIONAL)
 @router.delete("/{cat_id}")
-def delete_category(
+async def delete_category(
     cat_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    cat = db.query(Category).filter(Category.id == cat_id).first()
+    cat = await db.scalar(select(Category).where(Category.id == cat_id))
 
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    db.delete(cat)
-    db.commit()
+    await db.delete(cat)
+    await db.commit()
+    invalidate_category_matcher()
 
     return {"message": "Category deleted successfully"}
 
 
-def auto_assign_category(db, transaction):
-    text = ""
-
-    # take merchant and description text
-    if transaction.merchant:
-        text += transaction.merchant.lower() + " "
-    if transaction.description:
-        text += transaction.description.lower()
+# 🔹 RE-CATEGORIZE HISTORY (BACKGROUND JOB, ADMIN ONLY)
+# existing transactions keep their category when keywords change; this
+# rescans every user's transactions in chunks, so only admins
+# (ADMIN_USER_IDS) may start it; poll GET /categories/recategorize/{job_id}
+@router.post("/recategorize", response_model=JobResponse, status_code=202)
+def start_recategorize(
+    db: Session = Depends(get_sync_db),
+    current_user: User = Depends(get_admin_user)
+):
+    job = submit_recategorize_job(db, current_user.id)
+    if job is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Another re-categorization job is queued or running"
+        )
+    if job.status == "running":
+        raise HTTPException(
+            status_code=409,
+            detail=f"A re-categorization job is already running ({job.id})"
+        )
+    return job_status(job)
+
+
+@router.get("/recategorize/{job_id}", response_model=JobResponse)
+def get_recategorize_job(
+    job_id: str,
+    db: Session = Depends(get_sync_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return job_status(_recategorize_job(db, job_id, current_user.id))
 
-    # get all categories from DB
-    categories = db.query(Category).all()
 
-    # match keywords
-    for cat in categories:
-        if cat.keywords:
-            words = cat.keywords.split(",")
-            for word in words:
-                if word.strip().lower() in text:
-                    return cat.name
+@router.post("/recategorize/{job_id}/resume", response_model=JobResponse, status_code=202)
+def resume_recategorize(
+    job_id: str,
+    db: Session = Depends(get_sync_db),
+    current_user: User = Depends(get_admin_user)
+):
+    job = _recategorize_job(db, job_id, current_user.id)
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    job = resume_recategorize_job(db, job)
+    if job is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Another re-categorization job is queued or running"
+        )
+    return job_status(job)
+
+
+def _recategorize_job(db, job_id: str, user_id: int) -> BackgroundJob:
+    # jobs started from the CLI have no owner; resume them with the CLI
+    job = db.get(BackgroundJob, job_id)
+    if not job or job.kind != RECATEGORIZE_KIND or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # its worker died: report it failed (and so resumable)
+    if is_stale(job):
+        fail_stale_jobs(db)
+        db.refresh(job)
+    return job
+
+
+async def auto_assign_category(db: AsyncSession, transaction):
+    # compiled once per category change instead of a table scan per call; a
+    # rebuild reads the categories with an async query, never under a lock
+    matcher = await get_category_matcher_async(db)
+    return matcher.categorize(transaction.merchant, transaction.description)
@@ -1,70 +1,81 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, case, select, true
 from datetime import datetime
 
 from database import get_db
-from auth import get_current_user
-from models import User, Account, Transaction
+from auth import get_current_user, get_metrics_reader
+from models import User, Account, MonthlySpend
+from cache import TTLCache, MISSING, register_user_cache
 
 router = APIRouter(
     prefix="/dashboard",
     tags=["Dashboard"]
 )
 
+# per-user summaries, dropped whenever an account/transaction write commits
+summary_cache = register_user_cache(TTLCache("dashboard_summary", maxsize=50000, ttl=30))
 
-# 🔹 DASHBOARD SUMMARY API
-@router.get("/summary")
-def get_dashboard_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    # Total accounts
-    total_accounts = db.query(Account).filter(
-        Account.user_id == current_user.id
-    ).count()
-
-    # Total balance (sum of all accounts)
-    total_balance = db.query(func.sum(Account.balance)).filter(
-        Account.user_id == current_user.id
-    ).scalar() or 0
 
+async def _load_summary(db: AsyncSession, user_id: int):
     # Current month & year
     now = datetime.now()
-    month = now.month
-    year = now.year
 
-    # Monthly income
-    income = (
-        db.query(func.sum(Transaction.amount))
-        .join(Account)
-        .filter(
-            Account.user_id == current_user.id,
-            Transaction.txn_type == "credit",
-            func.extract("month", Transaction.txn_date) == month,
-            func.extract("year", Transaction.txn_date) == year,
-        )
-        .scalar()
-        or 0
-    )
+    # Total accounts + total balance
+    accounts = select(
+        func.count(Account.id).label("accounts"),
+        func.coalesce(func.sum(Account.balance), 0).label("balance")
+    ).where(Account.user_id == user_id).subquery()
+
+    # Monthly income / expenses (from the monthly rollup)
+    spend = select(
+        func.coalesce(func.sum(case(
+            (MonthlySpend.txn_type == "credit", MonthlySpend.total), else_=0
+        )), 0).label("income"),
+        func.coalesce(func.sum(case(
+            (MonthlySpend.txn_type == "debit", MonthlySpend.total), else_=0
+        )), 0).label("expenses")
+    ).where(
+        MonthlySpend.user_id == user_id,
+        MonthlySpend.year == now.year,
+        MonthlySpend.month == now.month,
+    ).subquery()
 
-    # Monthly expenses
-    expenses = (
-        db.query(func.sum(Transaction.amount))
-        .join(Account)
-        .filter(
-            Account.user_id == current_user.id,
-            Transaction.txn_type == "debit",
-            func.extract("month", Transaction.txn_date) == month,
-            func.extract("year", Transaction.txn_date) == year,
-        )
-        .scalar()
-        or 0
+    # both aggregates always return exactly one row -> one round trip
+    result = await db.execute(
+        select(accounts.c.balance, accounts.c.accounts,
+               spend.c.income, spend.c.expenses)
+        .select_from(accounts)
+        .join(spend, true())
     )
+    row = result.one()
 
     return {
-        "balance": float(total_balance),
-        "accounts": total_accounts,
-        "income": float(income),
-        "expenses": float(expenses),
+        "balance": float(row.balance),
+        "accounts": row.accounts,
+        "income": float(row.income),
+        "expenses": float(row.expenses),
     }
+
+
+# 🔹 DASHBOARD SUMMARY API
+@router.get("/summary")
+async def get_dashboard_summary(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    summary = summary_cache.get(current_user.id)
+    if summary is MISSING:
+        generation = summary_cache.generation(current_user.id)
+        summary = await _load_summary(db, current_user.id)
+        summary_cache.set(current_user.id, summary, generation)
+
+    return summary
+
+
+# 🔹 CACHE HIT RATE (ADMIN / METRICS_TOKEN ONLY: process-wide, not per user)
+@router.get("/cache-stats")
+async def get_cache_stats(
+    reader=Depends(get_metrics_reader)
+):
+    return summary_cache.stats()
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from database import get_db
 from auth import get_current_user
-from models import Reward, Account, Transaction, User
+from models import Reward, RewardLedgerEntry, Transaction, User
 from schemas import RewardCreate, RewardUpdate, RewardResponse
+from rollup import apply_transaction
+from balances import apply_balance
+from cache import touch_user
+import points as points_ledger
+from categorizer import SOURCE_SYSTEM
 
 router = APIRouter(
     prefix="/rewards",
@@ -16,9 +23,9 @@ router = APIRouter(
 # CREATE REWARD (KEEPED – NOT USED IN AUTO MODE)
 # =====================================================
 @router.post("/", response_model=RewardResponse)
-def create_reward(
+async def create_reward(
     reward: RewardCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     new_reward = Reward(
@@ -27,8 +34,12 @@ def create_reward(
         points_balance=reward.points_balance
     )
     db.add(new_reward)
-    db.commit()
-    db.refresh(new_reward)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Reward program already exists")
+    await db.refresh(new_reward)
     return new_reward
 
 
@@ -36,25 +47,22 @@ def create_reward(
 # LIST REWARDS (ALWAYS RETURN BANK REWARDS)
 # =====================================================
 @router.get("/", response_model=list[RewardResponse])
-def list_rewards(
-    db: Session = Depends(get_db),
+async def list_rewards(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    reward = db.query(Reward).filter(
-        Reward.user_id == current_user.id,
-        Reward.program_name == "Bank Rewards"
-    ).first()
-
     # 🔥 Auto-create if missing
-    if not reward:
-        reward = Reward(
-            user_id=current_user.id,
-            program_name="Bank Rewards",
-            points_balance=0
-        )
-        db.add(reward)
-        db.commit()
-        db.refresh(reward)
+    reward = await db.run_sync(points_ledger.get_or_create_reward, current_user.id)
+    balance = await db.run_sync(points_ledger.balance, current_user.id)
+    await db.commit()
+
+    # compacted balance + pending ledger entries, without writing them back
+    reward = RewardResponse(
+        id=reward.id,
+        program_name=reward.program_name,
+        points_balance=balance,
+        last_updated=reward.last_updated
+    )
 
     # Frontend expects array
     return [reward]
@@ -64,23 +72,23 @@ def list_rewards(
 # UPDATE POINTS (KEEPED FOR ADMIN / DEBUG)
 # =====================================================
 @router.put("/{reward_id}", response_model=RewardResponse)
-def update_reward(
+async def update_reward(
     reward_id: int,
     data: RewardUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    reward = db.query(Reward).filter(
+    reward = await db.scalar(select(Reward).where(
         Reward.id == reward_id,
         Reward.user_id == current_user.id
-    ).first()
+    ))
 
     if not reward:
         raise HTTPException(status_code=404, detail="Reward not found")
 
-    reward.points_balance = data.points_balance
-    db.commit()
-    db.refresh(reward)
+    await db.run_sync(points_ledger.set_balance, reward, data.points_balance)
+    await db.commit()
+    await db.refresh(reward)
     return reward
 
 
@@ -88,21 +96,25 @@ def update_reward(
 # DELETE REWARD (KEEPED)
 # =====================================================
 @router.delete("/{reward_id}")
-def delete_reward(
+async def delete_reward(
     reward_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    reward = db.query(Reward).filter(
+    reward = await db.scalar(select(Reward).where(
         Reward.id == reward_id,
         Reward.user_id == current_user.id
-    ).first()
+    ))
 
     if not reward:
         raise HTTPException(status_code=404, detail="Reward not found")
 
-    db.delete(reward)
-    db.commit()
+    await db.delete(reward)
+    if reward.program_name == points_ledger.PROGRAM:
+        await db.execute(delete(RewardLedgerEntry).where(
+            RewardLedgerEntry.user_id == current_user.id
+        ))
+    await db.commit()
     return {"message": "Reward deleted successfully"}
 
 
@@ -110,60 +122,55 @@ def delete_reward(
 # REDEEM REWARDS (FINAL & FIXED)
 # =====================================================
 @router.post("/redeem")
-def redeem_rewards(
+async def redeem_rewards(
     account_id: int = Query(...),
     points: int = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    reward = db.query(Reward).filter(
-        Reward.user_id == current_user.id,
-        Reward.program_name == "Bank Rewards"
-    ).first()
-
-    if not reward:
+    if not await db.run_sync(points_ledger.has_rewards, current_user.id):
         raise HTTPException(status_code=400, detail="No rewards available")
 
     if points <= 0:
         raise HTTPException(status_code=400, detail="Invalid points")
 
-    if reward.points_balance < points:
-        raise HTTPException(status_code=400, detail="Not enough reward points")
-
     credited_amount = points // 10  # 🔥 10 points = ₹1
 
     if credited_amount <= 0:
         raise HTTPException(status_code=400, detail="Minimum 10 points required")
 
-    account = db.query(Account).filter(
-        Account.id == account_id,
-        Account.user_id == current_user.id
-    ).first()
-
-    if not account:
+    # ✅ Credit bank account (one UPDATE ... RETURNING, ownership in its WHERE)
+    new_balance = await db.run_sync(
+        apply_balance, current_user.id, account_id, credited_amount
+    )
+    if new_balance is None:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    # ✅ Credit bank account
-    account.balance += credited_amount
-
-    # ✅ Deduct reward points
-    reward.points_balance -= points
+    # ✅ Deduct reward points: one conditional UPDATE, so concurrent
+    # redemptions can never take the balance below zero
+    remaining = await db.run_sync(points_ledger.redeem, current_user.id, points)
+    if remaining is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Not enough reward points")
 
     # ✅ Record transaction
     txn = Transaction(
-        account_id=account.id,
+        account_id=account_id,
         amount=credited_amount,
         txn_type="credit",
         description="Reward Redeemed",
         category="Rewards",
+        category_source=SOURCE_SYSTEM,
         txn_date=datetime.utcnow()
     )
 
     db.add(txn)
-    db.commit()
+    await db.run_sync(apply_transaction, current_user.id, txn)
+    touch_user(db, current_user.id)
+    await db.commit()
 
     return {
         "message": "Reward redeemed successfully",
         "credited_amount": credited_amount,
-        "remaining_points": reward.points_balance
+        "remaining_points": remaining
     }
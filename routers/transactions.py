@@ -1,118 +1,335 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+import csv
+import io
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-import csv, io
-from datetime import datetime
-from sqlalchemy import func
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import func, select, cast, Float, or_
 
 from routers.categorize import auto_assign_category
-from database import get_db
+from categorizer import SOURCE_AUTO, SOURCE_MANUAL
+from ingest import ingest_csv, ingest_items, BULK_MAX_ITEMS
+from jobs import submit_ingest_job, job_status, is_stale, fail_stale_jobs
+from rollup import apply_transaction
+from balances import apply_balance
+import points
+from cache import touch_user
+from database import get_db, get_sync_db, AsyncSessionLocal
 from auth import get_current_user
-from models import User, Account, Transaction, Category, Reward
-from schemas import TransactionCreate, TransactionResponse
+from models import (
+    User, Account, Transaction, Category, BackgroundJob, MonthlySpend
+)
+from schemas import TransactionCreate, TransactionResponse, JobResponse
+from fast_json import ORJSONResponse, rows_to_dicts, ndjson_lines
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, NEXT_CURSOR_HEADER,
+    keyset_order, next_cursor
+)
 
 router = APIRouter(
     prefix="/transactions",
     tags=["Transactions"]
 )
 
+# =====================================================
+# KEYSET PAGINATION / NDJSON STREAMING (SHARED)
+# =====================================================
+# exactly the TransactionResponse fields, as plain columns
+TRANSACTION_COLUMNS = (
+    Transaction.id,
+    Transaction.account_id,
+    cast(Transaction.amount, Float).label("amount"),
+    Transaction.txn_type,
+    Transaction.description,
+    Transaction.merchant,
+    Transaction.currency,
+    Transaction.category,
+    Transaction.txn_date,
+)
+
+
+async def _stream_transactions(query):
+    # own session: the request session may be closed before the body is sent
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            query.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        keys = list(result.keys())
+        async for rows in result.partitions():
+            yield ndjson_lines(keys, rows)
+
+
+async def _paginate_transactions(db, query, limit, after, stream):
+    query = keyset_order(query, after)
+
+    # no limit: the whole list, as before pagination (clients that page
+    # pass ?limit= and follow X-Next-Cursor); a stream honours it too
+    if limit is not None:
+        query = query.limit(limit)
+
+    if stream:
+        return StreamingResponse(
+            _stream_transactions(query),
+            media_type="application/x-ndjson"
+        )
+
+    rows = (await db.execute(query)).all()
+
+    headers = {}
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        headers[NEXT_CURSOR_HEADER] = cursor
+
+    return ORJSONResponse(rows_to_dicts(rows), headers=headers)
+
 # =====================================================
 # GET ALL TRANSACTIONS (LOGGED IN USER)
 # =====================================================
 @router.get("/", response_model=List[TransactionResponse])
-def get_all_transactions(
-    db: Session = Depends(get_db),
+async def get_all_transactions(
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = Query(None),
+    stream: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return (
-        db.query(Transaction)
-        .join(Account)
-        .filter(Account.user_id == current_user.id)
-        .all()
+    query = (
+        select(*TRANSACTION_COLUMNS)
+        .join(Account, Account.id == Transaction.account_id)
+        .where(Account.user_id == current_user.id)
     )
 
+    return await _paginate_transactions(db, query, limit, after, stream)
+
 # =====================================================
 # GET ALL CATEGORIES
 # =====================================================
 @router.get("/categories")
-def get_all_categories(
-    db: Session = Depends(get_db),
+async def get_all_categories(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Category).all()
+    return (await db.scalars(select(Category))).all()
 
 # =====================================================
 # CATEGORY SUMMARY (FOR CHARTS / BUDGETS)
 # =====================================================
 @router.get("/category-summary")
-def get_category_summary(
-    db: Session = Depends(get_db),
+async def get_category_summary(
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    result = (
-        db.query(Transaction.category, func.sum(Transaction.amount).label("total"))
-        .join(Account)
-        .filter(
-            Account.user_id == current_user.id,
-            Transaction.txn_type == "debit"
+    # read from the monthly rollup instead of scanning transactions
+    result = await db.execute(
+        select(MonthlySpend.category, func.sum(MonthlySpend.total).label("total"))
+        .where(
+            MonthlySpend.user_id == current_user.id,
+            MonthlySpend.txn_type == "debit"
         )
-        .group_by(Transaction.category)
-        .all()
+        .group_by(MonthlySpend.category)
+        .having(func.sum(MonthlySpend.txn_count) > 0)
     )
 
     return [
-        {"category": row[0], "total": float(row[1])}
+        {"category": row[0] or None, "total": float(row[1])}
         for row in result
     ]
 
+# =====================================================
+# SEARCH TRANSACTIONS (declared before /{account_id})
+# =====================================================
+def _date_window(query, from_date: date | None, to_date: date | None):
+    # inclusive on both ends, as half-open txn_date bounds (index friendly)
+    if from_date:
+        query = query.where(Transaction.txn_date >= datetime.combine(from_date, time.min))
+    if to_date:
+        query = query.where(
+            Transaction.txn_date < datetime.combine(to_date + timedelta(days=1), time.min)
+        )
+    return query
+
+
+def _like_pattern(q: str) -> str:
+    # the user's text is matched literally, wildcards included
+    q = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{q}%"
+
+
+def search_query(user_id: int, q: str | None = None,
+                 from_date: date | None = None, to_date: date | None = None,
+                 min_amount: float | None = None, max_amount: float | None = None,
+                 category: str | None = None, txn_type: str | None = None):
+    query = (
+        select(*TRANSACTION_COLUMNS)
+        .join(Account, Account.id == Transaction.account_id)
+        .where(Account.user_id == user_id)
+    )
+
+    # substring match on merchant or description; on Postgres each side is
+    # served by its pg_trgm GIN index (3+ characters needed for trigrams)
+    if q:
+        pattern = _like_pattern(q.strip())
+        query = query.where(or_(
+            Transaction.merchant.ilike(pattern, escape="\\"),
+            Transaction.description.ilike(pattern, escape="\\")
+        ))
+
+    query = _date_window(query, from_date, to_date)
+
+    if min_amount is not None:
+        query = query.where(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        query = query.where(Transaction.amount <= max_amount)
+    if category:
+        query = query.where(Transaction.category == category)
+    if txn_type:
+        query = query.where(func.lower(Transaction.txn_type) == txn_type.lower())
+
+    return query
+
+
+@router.get("/search", response_model=List[TransactionResponse])
+async def search_transactions(
+    q: str | None = Query(None, min_length=3, max_length=100),
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    min_amount: float | None = Query(None),
+    max_amount: float | None = Query(None),
+    category: str | None = Query(None),
+    txn_type: str | None = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = Query(None),
+    stream: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if from_date and to_date and to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    query = search_query(
+        current_user.id, q, from_date, to_date,
+        min_amount, max_amount, category, txn_type
+    )
+    return await _paginate_transactions(db, query, limit, after, stream)
+
+# =====================================================
+# CSV EXPORT (declared before /{account_id})
+# =====================================================
+# the upload-csv columns plus id / currency / category, so an export can be
+# uploaded again; amount stays a Decimal so the text is exact
+EXPORT_COLUMNS = tuple(
+    Transaction.amount if column.key == "amount" else column
+    for column in TRANSACTION_COLUMNS
+)
+
+
+def _csv_lines(rows) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+async def _stream_csv(account_ids, from_date, to_date):
+    # own session: the request session may be closed before the body is sent
+    async with AsyncSessionLocal() as db:
+        yield _csv_lines([[column.key for column in EXPORT_COLUMNS]])
+
+        # one account at a time: each is a plain range scan of
+        # ix_transactions_account_date in (txn_date, id) order, so nothing
+        # has to be sorted before the first row goes out
+        for account_id in account_ids:
+            query = _date_window(
+                select(*EXPORT_COLUMNS).where(Transaction.account_id == account_id),
+                from_date, to_date
+            ).order_by(Transaction.txn_date, Transaction.id)
+
+            result = await db.stream(
+                query.execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                yield _csv_lines(rows)
+
+
+@router.get("/export.csv")
+async def export_transactions_csv(
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    account_id: int | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if from_date and to_date and to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    query = select(Account.id).where(Account.user_id == current_user.id)
+    if account_id is not None:
+        query = query.where(Account.id == account_id)
+    account_ids = (await db.scalars(query.order_by(Account.id))).all()
+
+    if account_id is not None and not account_ids:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    return StreamingResponse(
+        _stream_csv(account_ids, from_date, to_date),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transactions.csv"'}
+    )
+
 # =====================================================
 # GET TRANSACTIONS FOR SPECIFIC ACCOUNT
 # =====================================================
 @router.get("/{account_id}", response_model=List[TransactionResponse])
-def get_transactions(
+async def get_transactions(
     account_id: int,
-    db: Session = Depends(get_db),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = Query(None),
+    stream: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    account = db.query(Account).filter(
+    account = await db.scalar(select(Account).where(
         Account.id == account_id,
         Account.user_id == current_user.id
-    ).first()
+    ))
 
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    return db.query(Transaction).filter(
+    query = select(*TRANSACTION_COLUMNS).where(
         Transaction.account_id == account_id
-    ).all()
+    )
+
+    return await _paginate_transactions(db, query, limit, after, stream)
 
 # =====================================================
 # CREATE NEW TRANSACTION (AUTO REWARD SYSTEM – FIXED)
 # =====================================================
 @router.post("/", response_model=TransactionResponse)
-def create_transaction(
+async def create_transaction(
     transaction: TransactionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    account = db.query(Account).filter(
-        Account.id == transaction.account_id,
-        Account.user_id == current_user.id
-    ).first()
-
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
-
     # -------------------------------
     # UPDATE ACCOUNT BALANCE
     # -------------------------------
     if transaction.txn_type.lower() == "credit":
-        account.balance += transaction.amount
+        delta = transaction.amount
     elif transaction.txn_type.lower() == "debit":
-        account.balance -= transaction.amount
+        delta = -transaction.amount
     else:
         raise HTTPException(status_code=400, detail="Invalid transaction type")
 
+    # one UPDATE ... RETURNING; the ownership check is part of its WHERE
+    new_balance = await db.run_sync(
+        apply_balance, current_user.id, transaction.account_id, delta
+    )
+    if new_balance is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+
     # -------------------------------
     # CREATE TRANSACTION
     # -------------------------------
@@ -126,124 +343,136 @@ def create_transaction(
         currency=transaction.currency
     )
 
-    new_txn.category = auto_assign_category(db, new_txn)
+    new_txn.category = await auto_assign_category(db, new_txn)
+    new_txn.category_source = SOURCE_AUTO
     db.add(new_txn)
+    await db.run_sync(apply_transaction, current_user.id, new_txn)
+    touch_user(db, current_user.id)
 
     # =================================================
     # 🔥 AUTO REWARD SYSTEM (₹100 = 1 POINT)
     # =================================================
+    # ledger insert only -- no read-modify-write of the Reward row
     if transaction.txn_type.lower() == "debit":
-        earned_points = int(transaction.amount // 100)
-
-        if earned_points > 0:
-            reward = db.query(Reward).filter(
-                Reward.user_id == current_user.id,
-                Reward.program_name == "Bank Rewards"
-            ).first()
-
-            if not reward:
-                reward = Reward(
-                    user_id=current_user.id,
-                    program_name="Bank Rewards",
-                    points_balance=0
-                )
-                db.add(reward)
-
-            reward.points_balance += earned_points
-
-    db.commit()
-    db.refresh(new_txn)
+        points.accrue(db, current_user.id, int(transaction.amount // 100), "debit")
+
+    await db.commit()
+    await db.refresh(new_txn)
     return new_txn
 
+# =====================================================
+# BULK CREATE (AGGREGATORS)
+# =====================================================
+# same pipeline as the CSV upload: one ownership query, in-memory
+# categorizing, multi-row INSERT ... RETURNING, aggregated balance /
+# rollup / reward deltas and a single commit
+@router.post("/bulk")
+def create_transactions_bulk(
+    items: List[TransactionCreate],
+    db: Session = Depends(get_sync_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not items:
+        raise HTTPException(status_code=400, detail="No transactions given")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_MAX_ITEMS} transactions per request"
+        )
+
+    result, outcomes = ingest_items(db, current_user.id, items)
+
+    return ORJSONResponse({
+        "created": result.created,
+        "rejected": result.skipped,
+        "results": outcomes
+    })
+
 # =====================================================
 # CSV UPLOAD (NOW WITH REWARD SUPPORT)
 # =====================================================
+# stays sync (threadpool): parsing/categorizing is CPU-bound and the bulk
+# writes use the sync driver (COPY on psycopg2)
 @router.post("/upload-csv")
 def upload_transactions_csv(
+    response: Response,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    background: bool = Query(False),
+    db: Session = Depends(get_sync_db),
     current_user: User = Depends(get_current_user)
 ):
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files allowed")
 
-    content = file.file.read().decode("utf-8")
-    reader = csv.DictReader(io.StringIO(content))
-    created = 0
+    # large statements: return a job id now, poll /upload-jobs/{id}
+    if background:
+        job = submit_ingest_job(db, current_user.id, file.file)
+        response.status_code = 202
+        return {"job_id": job.id, "status": job.status}
 
-    reward = db.query(Reward).filter(
-        Reward.user_id == current_user.id,
-        Reward.program_name == "Bank Rewards"
-    ).first()
+    # streamed in chunks, bulk inserted, one balance/reward update at the end
+    result = ingest_csv(db, current_user.id, file.file)
 
-    if not reward:
-        reward = Reward(
-            user_id=current_user.id,
-            program_name="Bank Rewards",
-            points_balance=0
-        )
-        db.add(reward)
-
-    for row in reader:
-        if "account_id" not in row:
-            continue
-
-        account = db.query(Account).filter(
-            Account.id == int(row["account_id"]),
-            Account.user_id == current_user.id
-        ).first()
-
-        if not account:
-            continue
-
-        amount = float(row["amount"])
-        txn_type = row["txn_type"].lower()
-
-        if txn_type == "credit":
-            account.balance += amount
-        elif txn_type == "debit":
-            account.balance -= amount
-        else:
-            continue
-
-        txn = Transaction(
-            account_id=account.id,
-            amount=amount,
-            txn_type=txn_type,
-            description=row.get("description"),
-            merchant=row.get("merchant"),
-            txn_date=datetime.utcnow()
-        )
+    return {
+        "message": f"{result.created} transactions uploaded successfully",
+        "created": result.created,
+        "skipped": result.skipped
+    }
+
+# =====================================================
+# CSV UPLOAD JOB PROGRESS
+# =====================================================
+@router.get("/upload-jobs/{job_id}", response_model=JobResponse)
+async def get_upload_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await db.scalar(select(BackgroundJob).where(
+        BackgroundJob.id == job_id,
+        BackgroundJob.user_id == current_user.id
+    ))
 
-        txn.category = auto_assign_category(db, txn)
-        db.add(txn)
-        created += 1
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-        # 🔥 Reward for CSV debit
-        if txn_type == "debit":
-            reward.points_balance += int(amount // 100)
+    # its worker died: report it failed instead of running forever
+    if is_stale(job):
+        await db.run_sync(fail_stale_jobs)
+        await db.refresh(job)
 
-    db.commit()
-    return {"message": f"{created} transactions uploaded successfully"}
+    return job_status(job)
 
 # =====================================================
 # UPDATE CATEGORY (MANUAL)
 # =====================================================
 @router.put("/{txn_id}/category")
-def update_transaction_category(
+async def update_transaction_category(
     txn_id: int,
     category: str = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    txn = db.query(Transaction).filter(Transaction.id == txn_id).first()
+    row = (await db.execute(
+        select(Transaction, Account.user_id)
+        .join(Account)
+        .where(Transaction.id == txn_id)
+    )).first()
 
-    if not txn:
+    if not row:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
+    txn, owner_id = row
+
+    # move the amount between rollup categories
+    await db.run_sync(apply_transaction, owner_id, txn, -1)
     txn.category = category
-    db.commit()
-    db.refresh(txn)
+    # never overwritten by a re-categorization job
+    txn.category_source = SOURCE_MANUAL
+    await db.run_sync(apply_transaction, owner_id, txn)
+
+    await db.commit()
+    await db.refresh(txn)
 
     return {
         "message": "Category updated successfully",
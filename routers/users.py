@@ -1,54 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
-from database import SessionLocal
 from models import User
 
 from schemas import RegisterUser
-from auth import hash_password, verify_password, create_access_token
+from auth import hash_password_async, verify_and_update_password, create_access_token
 from database import get_db
 router = APIRouter(tags=["Users"])
 
+# bcrypt runs on auth.hash_executor, never on the event loop or request threads
+
 
 # ================= REGISTER =================
 
 @router.post("/register")
-def register(user: RegisterUser, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user.email).first()
+async def register(user: RegisterUser, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(User).where(User.email == user.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already exists")
 
     new_user = User(
         name=user.name,
         email=user.email,
-        password=hash_password(user.password),
+        password=await hash_password_async(user.password),
         phone=user.phone,
      
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return {"message": "User registered successfully"}
 
 # ================= LOGIN =================
 
 @router.post("/login")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not user or not verify_password(form_data.password,user.password):
+    valid, new_hash = await verify_and_update_password(form_data.password, user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # 🔁 work factor changed since this hash was made -> upgrade it
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
     # ✅ TOKEN STORES user.id
     token = create_access_token(user.id)
 
     return {
         "access_token": token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
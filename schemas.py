@@ -148,4 +148,25 @@ class RewardResponse(BaseModel):
 
 class RewardRedeem(BaseModel):
     reward_id: int
-    account_id: int
\ No newline at end of file
+    account_id: int
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    rows_processed: int
+    rows_rejected: int
+    rows_per_second: float
+    rows_total: Optional[int] = None
+    checkpoint: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class Granularity(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"